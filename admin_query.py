@@ -0,0 +1,144 @@
+import base64
+import re
+from bson import json_util
+from bson.objectid import ObjectId
+from importer import COERCIONS
+
+# Query building for the admin data browser (GET /api/admin/data/<collection>).
+#
+# Pages are keyset-paginated on (sort field, _id), so page 500 costs the same
+# as page 1. Sorting is limited to indexed fields, filters are a small
+# whitelist of operators on plain field names, and the client picks the
+# fields it wants back.
+#
+#   ?sort=timestamp&order=desc&limit=50
+#   &filter=depot_id:eq:EKM&filter=platformNumber:gte:3&filter=busRegNo:prefix:KL-15
+#   &fields=busRegNo,timestamp&after=<next from the previous page>
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Fields each collection can be sorted on; _id always works. Each has a
+# (field, _id) index in indexes.py, so a page is an index range scan
+SORTABLE_FIELDS = {
+    "waybills": ["timestamp", "busRegNo"],
+    "users": ["stationMasterId_lower"],
+    "crew": ["crew_id"],
+    "buses": ["bus_reg_no"],
+    "places": ["name"],
+}
+
+HIDDEN_FIELDS = {"users": ["password"]}
+
+FILTER_OPERATORS = {
+    "eq": "$eq", "ne": "$ne", "gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte",
+    "in": "$in", "prefix": None, "exists": "$exists",
+}
+
+# Plain (optionally dotted) field names only, so nothing can smuggle in a $operator
+FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$')
+
+def _field(name, collection_name):
+    if not FIELD_NAME.match(name):
+        raise ValueError(f"Invalid field name: {name}")
+    if name in HIDDEN_FIELDS.get(collection_name, []):
+        raise ValueError(f"{name} cannot be queried")
+    return name
+
+def _coerce(collection_name, field, value):
+    """Filter values arrive as strings; give them the type stored in the collection."""
+    if field == '_id':
+        return ObjectId(value) if ObjectId.is_valid(value) else value
+    coerce = COERCIONS.get(collection_name, {}).get(field)
+    return coerce(value) if coerce else value
+
+def parse_filters(collection_name, raw_filters):
+    """["field:op:value", ...] -> a MongoDB filter. Raises ValueError on anything else."""
+    clauses = []
+    for raw in raw_filters:
+        try:
+            field, op, value = raw.split(':', 2)
+        except ValueError:
+            raise ValueError(f"Filter must be field:op:value, got {raw!r}")
+        field = _field(field, collection_name)
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op}")
+        if op == 'prefix':
+            clauses.append({field: {"$regex": "^" + re.escape(value)}})
+        elif op == 'exists':
+            clauses.append({field: {"$exists": value.lower() in ('1', 'true', 'yes')}})
+        elif op == 'in':
+            clauses.append({field: {"$in": [_coerce(collection_name, field, v) for v in value.split('|')]}})
+        else:
+            clauses.append({field: {FILTER_OPERATORS[op]: _coerce(collection_name, field, value)}})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def parse_projection(collection_name, raw_fields):
+    hidden = HIDDEN_FIELDS.get(collection_name, [])
+    fields = [_field(f.strip(), collection_name) for f in (raw_fields or '').split(',') if f.strip()]
+    if fields:
+        return {field: 1 for field in fields}
+    return {field: 0 for field in hidden} or None
+
+def encode_cursor(doc, sort_field):
+    raw = json_util.dumps([doc.get(sort_field), doc['_id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    """Raises ValueError if the token was not produced by encode_cursor."""
+    try:
+        value, doc_id = json_util.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return value, doc_id
+
+def _after_clause(sort_field, direction, value, doc_id):
+    """Everything strictly after (value, doc_id) in (sort_field, _id) order."""
+    past = "$gt" if direction == 1 else "$lt"
+    if sort_field == '_id':
+        return {"_id": {past: doc_id}}
+    if value is None:
+        # Missing values sort before everything else
+        same = {sort_field: None, "_id": {past: doc_id}}
+        return {"$or": [same, {sort_field: {"$ne": None}}]} if direction == 1 else same
+    clauses = [
+        {sort_field: {past: value}},
+        {sort_field: value, "_id": {past: doc_id}}
+    ]
+    if direction == -1:
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+def browse(col, collection_name, args):
+    """
+    Runs one page of the browser for request args (a MultiDict).
+    Returns (items, next_cursor, sort_field). Raises ValueError on bad input.
+    """
+    sort_field = args.get('sort', '_id')
+    if sort_field != '_id' and sort_field not in SORTABLE_FIELDS.get(collection_name, []):
+        raise ValueError(f"Cannot sort {collection_name} by {sort_field}")
+    direction = -1 if args.get('order', 'asc') == 'desc' else 1
+    try:
+        limit = max(1, min(int(args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be a number")
+
+    query = parse_filters(collection_name, args.getlist('filter'))
+    if args.get('after'):
+        after = _after_clause(sort_field, direction, *decode_cursor(args['after']))
+        query = {"$and": [query, after]} if query else after
+
+    projection = parse_projection(collection_name, args.get('fields'))
+    if projection and 1 in projection.values():
+        projection[sort_field] = 1 # Needed to build the next cursor
+
+    sort = [(sort_field, direction)] if sort_field == '_id' else [(sort_field, direction), ("_id", direction)]
+    docs = list(col.find(query, projection).sort(sort).limit(limit + 1))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor, sort_field
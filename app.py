@@ -1,21 +1,124 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
-from flask_pymongo import PyMongo
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from bson.objectid import ObjectId
 from dotenv import load_dotenv
+from indexes import ensure_indexes
+from migrations import backfill_station_master_keys
+from normalize import bus_key_fields, bus_key_query, normalize_bus_key, normalize_station_master_id
+from live_feed import LiveFeedHub
+from stats_cache import DepotDayStats, StatsCache
+from pipelines import depot_day_stats_pipeline, master_log_pipeline
+from serializers import HISTORY_VIEW, HOME_VIEW, LIVE_VIEW, SEARCH_VIEW
+from autocomplete import AutocompleteIndex
+from lru_cache import MISSING, LRUTTLCache, SharedVersion
+from rollups import start_rollup_worker
+from catalog_stats import CatalogStats
+from metrics import Metrics, MongoCommandMetrics
+from connections import MongoConnection, client_options_from_env
+from sessions import FileSessionStore, MemorySessionStore, MongoSessionStore, ServerSessionInterface
+from importer import UPSERT_KEYS, create_job, run_import, start_import
+from admin_query import SORTABLE_FIELDS, browse
+from waybill_schema import normalize_waybill
+from exporter import DEFAULT_FIELDS, EXPORTABLE, FORMATS, build_export_query, build_projection, export_cursor, export_filename, gzip_chunks, parse_fields
 from datetime import datetime, timedelta
+from jinja2 import FileSystemBytecodeCache
+import gzip
+import hashlib
+import json
 import os
+import queue
+import sys
+import tempfile
+import time
+
+try:
+    import brotli # Optional: br encoding for /api/reference-bundle
+except ImportError:
+    brotli = None
 
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# Workers load compiled templates from disk instead of re-parsing them after every start
+_jinja_cache_dir = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "rtc-jinja"))
+os.makedirs(_jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(_jinja_cache_dir)
+# Must be the same in every worker, or a cookie signed by one is rejected by the others
+app.secret_key = os.getenv("SECRET_KEY")
+if not app.secret_key:
+    print("WARNING: SECRET_KEY is not set; using a random key. Sessions will not survive a restart or work across workers.")
+    app.secret_key = os.urandom(24)
 
 # Configure MongoDB
 uri = os.getenv("MONGO_URI")
 print(f"DEBUG: Loading MONGO_URI: {uri}")
 app.config["MONGO_URI"] = uri
-mongo = PyMongo(app)
+metrics = Metrics()
+# Client created lazily in each worker after fork; pool/timeouts/compression from MONGO_* env vars
+mongo = MongoConnection(app, event_listeners=[MongoCommandMetrics(metrics)], **client_options_from_env())
+metrics.collectors.append(mongo.pool_stats.prometheus_lines)
 print(f"DEBUG: Mongo initialized. DB: {mongo.db}")
 
+# Server-side sessions: SESSION_BACKEND=mongo (default), file (SESSION_FILE_DIR) or memory
+_session_backend = os.getenv("SESSION_BACKEND", "mongo")
+if _session_backend == 'file':
+    _session_store = FileSessionStore(os.getenv("SESSION_FILE_DIR", os.path.join(tempfile.gettempdir(), "rtc-sessions")))
+elif _session_backend == 'memory':
+    _session_store = MemorySessionStore()
+else:
+    _session_store = MongoSessionStore(lambda: mongo.db.sessions)
+app.session_interface = ServerSessionInterface(
+    _session_store,
+    lifetime=timedelta(hours=int(os.getenv("SESSION_LIFETIME_HOURS", "12"))),
+    # >0 caches sessions per worker, delaying logout on the other workers by up to that many seconds
+    cache_ttl=int(os.getenv("SESSION_CACHE_TTL", "0")),
+    # No session lookup for requests that never use one
+    skip_paths=(f"{app.static_url_path}/", "/metrics", "/readyz")
+)
+
+# --- Metrics: per-route latency, sizes, status codes and MongoDB time ---
+@app.before_request
+def _start_request_metrics():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.start_request(route, session.get('user', {}).get('depot_id', ''))
+
+@app.after_request
+def _finish_request_metrics(response):
+    response_size = None if response.is_streamed else response.calculate_content_length()
+    metrics.finish_request(request.method, response.status_code, request.content_length, response_size)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Create the indexes the routes below rely on (set ENSURE_INDEXES=0 to skip).
+# Run `python indexes.py` to also check each route's query plan.
+if os.getenv("ENSURE_INDEXES", "1") != "0":
+    try:
+        ensure_indexes(mongo.db)
+        # Users created before stationMasterId_lower existed can't log in without it
+        backfill_station_master_keys(mongo.db)
+    except Exception as e:
+        print(f"ERROR: Index provisioning failed: {str(e)}")
+
+# Rows rendered into the first paint; script.js loads the rest of today from /api/live-data
+HOME_PAGE_ROWS = int(os.getenv("HOME_PAGE_ROWS", "50"))
+
+def _home_waybills(col, depot_id, now, limit=HOME_PAGE_ROWS):
+    """Today's newest waybills for a depot, only the fields index.html shows."""
+    start_of_day = datetime(now.year, now.month, now.day, 0, 0, 0)
+    cursor = col.find(
+        {"depot_id": depot_id, "timestamp": {"$gte": start_of_day}},
+        HOME_VIEW.projection
+    ).sort("timestamp", -1).limit(limit)
+    return HOME_VIEW.serialize_many(cursor)
+
 @app.route('/')
 @app.route('/index.html')
 def home():
@@ -23,8 +126,8 @@ def home():
     waybills = []
     if 'user' in session:
         depot_id = session['user']['depot_id']
-        # Fetch waybills for this depot, sorted by most recent
-        waybills = list(mongo.db.waybills.find({"depot_id": depot_id}).sort("timestamp", -1))
+        # A bounded slice of today, the same rows the live feed would show first
+        waybills = _home_waybills(mongo.db.waybills, depot_id, datetime.now())
     
     return render_template('index.html', waybills=waybills)
 
@@ -40,10 +143,10 @@ def login():
         # Find user in DB
         try:
             print(f"DEBUG: Querying database for user: {station_master_id}")
-            # Query by stationMasterId (case-insensitive)
+            # Query by the normalized stationMasterId (case-insensitive, indexed)
             # We ignore depotId in the query for flexibility, trusting unique SM ID
             user = mongo.db.users.find_one({
-                "stationMasterId": {"$regex": f"^{station_master_id}$", "$options": "i"}
+                "stationMasterId_lower": normalize_station_master_id(station_master_id)
             })
             print(f"DEBUG: Query result: {'User found' if user else 'User NOT found'}")
         except Exception as e:
@@ -65,7 +168,8 @@ def login():
                 elif 'platforms' in user:
                    platforms = user['platforms']
                 
-                # Create session
+                # Create session (under a fresh id)
+                session.regenerate()
                 session['user'] = {
                     "depot_id": user.get('depotId'),
                     "station_master_id": user.get('stationMasterId'),
@@ -97,82 +201,299 @@ def logout():
     session.pop('user', None)
     return redirect(url_for('login'))
 
+# Set once we learn the server is a standalone mongod without transactions
+_transactions_supported = True
+
+def _upsert_if_changed(key_field, key, fields, now, extra=None):
+    """
+    Upsert that only touches last_updated when one of the fields differs
+    from the stored row. An unchanged row is a server-side no-op (nothing
+    written, modified_count 0), whichever worker or admin edit wrote it last.
+    extra adds further $set stage expressions (evaluated on the stored row).
+    """
+    unchanged = {"$and": [{"$eq": [f"${k}", {"$literal": v}]} for k, v in fields.items()]}
+    stage = {k: {"$literal": v} for k, v in fields.items()}
+    stage.update(extra or {})
+    stage[key_field] = {"$literal": key}
+    stage["last_updated"] = {"$cond": [unchanged, "$last_updated", now]} if fields else {"$ifNull": ["$last_updated", now]}
+    return UpdateOne({key_field: key}, [{"$set": stage}], upsert=True)
+
+def _build_registry_ops(data, now, depot_id=None):
+    """
+    Builds the bus and crew upserts for a waybill, keyed by bus_reg_no and
+    crew_id. Only values the waybill carries are set, so a waybill without a
+    phone never blanks the stored one. Crew rows also collect the depots
+    they have worked at (depot_ids) for the reference bundle.
+    """
+    bus_ops = {}
+    crew_ops = {}
+
+    bus_reg_no = data.get('busRegNo')
+    if bus_reg_no:
+        fields = {"service_category": data.get('serviceCategory'), **bus_key_fields(bus_reg_no)}
+        bus_ops[bus_reg_no] = _upsert_if_changed(
+            "bus_reg_no", bus_reg_no, {k: v for k, v in fields.items() if v}, now)
+
+    for role, prefix in (("Conductor", "conductor"), ("Driver", "driver")):
+        crew_id = data.get(f'{prefix}Id')
+        if not crew_id:
+            continue
+        fields = {"name": data.get(f'{prefix}Name'), "phone": data.get(f'{prefix}Phone'), "role": role}
+        extra = None
+        if depot_id:
+            depot_ids = {"$ifNull": ["$depot_ids", []]}
+            extra = {"depot_ids": {"$cond": [
+                {"$in": [depot_id, depot_ids]}, depot_ids, {"$concatArrays": [depot_ids, [depot_id]]}
+            ]}}
+        crew_ops[crew_id] = _upsert_if_changed(
+            "crew_id", crew_id, {k: v for k, v in fields.items() if v}, now, extra)
+
+    return bus_ops, crew_ops
+
+def _write_registry(bus_ops, crew_ops, db_session):
+    """Runs the bus/crew upserts; returns (buses changed, crew changed)."""
+    changed = []
+    for collection, ops in ((mongo.db.buses, bus_ops), (mongo.db.crew, crew_ops)):
+        result = collection.bulk_write(list(ops.values()), ordered=False, session=db_session) if ops else None
+        changed.append(bool(result and (result.modified_count or result.upserted_count)))
+    return tuple(changed)
+
+def _build_waybill_record(data, now, user):
+    """
+    Turns the submitted form into a waybill document (see waybill_schema.py)
+    logged by the session user. Raises ValueError for a malformed waybill.
+    """
+    waybill_record = normalize_waybill(data)
+    waybill_record['timestamp'] = now
+    waybill_record['logged_by'] = user['station_master_id']
+    waybill_record['depot_id'] = user['depot_id']
+    return waybill_record
+
+def _run_write_unit(write):
+    """
+    Runs write(db_session) inside a transaction when the server supports it.
+    Standalone mongod has no transactions, so we fall back to running the
+    writes directly (still as one bulk batch per collection).
+    """
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            with mongo.cx.start_session() as db_session:
+                return db_session.with_transaction(lambda s: write(s))
+        except OperationFailure as e:
+            # 20 = IllegalOperation: "Transaction numbers are only allowed on a replica set member"
+            if e.code != 20:
+                raise
+            print("DEBUG: Transactions not supported by server, writing without one.")
+            _transactions_supported = False
+    return write(None)
+
 @app.route('/api/waybill', methods=['POST'])
 def save_waybill():
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data:
             return jsonify({"status": "error", "message": "No data provided"}), 400
 
-        # Extract data components
-        bus_reg_no = data.get('busRegNo')
-        conductor_id = data.get('conductorId')
-        driver_id = data.get('driverId')
-
-        # 1. Update Bus Collection (Upsert)
-        if bus_reg_no:
-            mongo.db.buses.update_one(
-                {"bus_reg_no": bus_reg_no},
-                {"$set": {
-                    "bus_reg_no": bus_reg_no,
-                    "service_category": data.get('serviceCategory'),
-                    "last_updated": datetime.now()
-                }},
-                upsert=True
-            )
+        timings = {}
+        started = time.perf_counter()
+        now = datetime.now()
 
-        # 2. Update Crew Collection - Conductor (Upsert)
-        if conductor_id:
-            mongo.db.crew.update_one(
-                {"crew_id": conductor_id},
-                {"$set": {
-                    "crew_id": conductor_id,
-                    "name": data.get('conductorName'),
-                    "phone": data.get('conductorPhone'),
-                    "role": "Conductor",
-                    "last_updated": datetime.now()
-                }},
-                upsert=True
-            )
+        # 1. Build the waybill record and bus/crew upserts
+        user = session.get('user')
+        try:
+            waybill_record = _build_waybill_record(data, now, user)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        bus_ops, crew_ops = _build_registry_ops(data, now, user['depot_id'])
+        timings['prepare'] = time.perf_counter() - started
 
-        # 3. Update Crew Collection - Driver (Upsert)
-        if driver_id:
-            mongo.db.crew.update_one(
-                {"crew_id": driver_id},
-                {"$set": {
-                    "crew_id": driver_id,
-                    "name": data.get('driverName'),
-                    "phone": data.get('driverPhone'),
-                    "role": "Driver",
-                    "last_updated": datetime.now()
-                }},
-                upsert=True
-            )
+        # 2. Write everything as one unit
+        def write(db_session):
+            stage = time.perf_counter()
+            changed = _write_registry(bus_ops, crew_ops, db_session)
+            timings['registry'] = time.perf_counter() - stage
 
-        # 4. Save Waybill Record
-        waybill_record = data.copy()
-        
-        # Ensure platformNumber is stored as an integer for consistent comparison
-        if 'platformNumber' in waybill_record and waybill_record['platformNumber']:
+            stage = time.perf_counter()
+            mongo.db.waybills.insert_one(waybill_record, session=db_session)
+            timings['insert'] = time.perf_counter() - stage
+            return changed
+
+        buses_changed, crew_changed = _run_write_unit(write)
+        live_stats_cache.record(waybill_record)
+        if buses_changed:
+            bus_suggestions.upsert({"bus_reg_no": data['busRegNo'], "service_category": data.get('serviceCategory')})
+        if buses_changed or crew_changed:
+            _reference_bundles.clear()
+        if crew_changed:
+            _crew_written(crew_ops)
+        timings['total'] = time.perf_counter() - started
+
+        timings_ms = {k: round(v * 1000, 2) for k, v in timings.items()}
+        response = jsonify({
+            "status": "success",
+            "message": "Waybill entry logged successfully",
+            "timings_ms": timings_ms
+        })
+        response.headers['Server-Timing'] = ", ".join(
+            f"{k};dur={v}" for k, v in timings_ms.items()
+        )
+        return response, 201
+
+    except Exception as e:
+        print(f"ERROR in /api/waybill: {str(e)}")
+        return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
+
+# Upper bound on entries accepted by one /api/waybill/batch request
+WAYBILL_BATCH_LIMIT = int(os.getenv("WAYBILL_BATCH_LIMIT", "500"))
+
+@app.route('/api/waybill/batch', methods=['POST'])
+def save_waybill_batch():
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    try:
+        payload = request.get_json(silent=True) # Not JSON: None, answered with the 400 below
+        entries = payload.get('waybills') if isinstance(payload, dict) else payload
+        if not isinstance(entries, list) or not entries:
+            return jsonify({"status": "error", "message": "No waybills provided"}), 400
+        if len(entries) > WAYBILL_BATCH_LIMIT:
+            return jsonify({"status": "error", "message": f"Batch exceeds {WAYBILL_BATCH_LIMIT} waybills"}), 413
+
+        timings = {}
+        started = time.perf_counter()
+        now = datetime.now()
+        user = session.get('user')
+
+        # 1. Validate entries one by one, dropping repeats of the same key
+        records = []
+        accepted_data = []
+        rejected = []
+        seen_keys = set()
+        duplicates = []
+        for index, data in enumerate(entries):
             try:
-                waybill_record['platformNumber'] = int(waybill_record['platformNumber'])
-            except ValueError:
-                pass # Keep as string if conversion fails check
+                record = _build_waybill_record(data, now, user)
+            except ValueError as e:
+                key = data.get('idempotencyKey') if isinstance(data, dict) else None
+                rejected.append({"index": index, "idempotencyKey": key, "message": str(e)})
+                continue
+            key = record.get('idempotency_key')
+            if key:
+                if key in seen_keys:
+                    duplicates.append(key)
+                    continue
+                seen_keys.add(key)
+            records.append(record)
+            accepted_data.append(data)
+
+        # 2. Skip entries already stored by an earlier (possibly half-acknowledged) flush
+        stored_ids = {}
+        if seen_keys:
+            stored = mongo.db.waybills.find(
+                {"idempotency_key": {"$in": list(seen_keys)}},
+                {"_id": 1, "idempotency_key": 1}
+            )
+            stored_ids = {doc['idempotency_key']: doc['_id'] for doc in stored}
+            stored_keys = set(stored_ids)
+            if stored_keys:
+                duplicates.extend(stored_keys)
+                kept = [(r, d) for r, d in zip(records, accepted_data)
+                        if r.get('idempotency_key') not in stored_keys]
+                records = [r for r, _ in kept]
+                accepted_data = [d for _, d in kept]
 
-        waybill_record['timestamp'] = datetime.now()
-        # Add session user info if logged in
-        if 'user' in session:
-            waybill_record['logged_by'] = session['user']['station_master_id']
-            waybill_record['depot_id'] = session['user']['depot_id']
+        # 3. Group bus/crew upserts so each row is written once per batch
+        bus_ops = {}
+        crew_ops = {}
+        for data in accepted_data:
+            entry_bus_ops, entry_crew_ops = _build_registry_ops(data, now, user['depot_id'])
+            bus_ops.update(entry_bus_ops)
+            crew_ops.update(entry_crew_ops)
+        timings['prepare'] = time.perf_counter() - started
 
-        mongo.db.waybills.insert_one(waybill_record)
+        def write(db_session):
+            stage = time.perf_counter()
+            changed = _write_registry(bus_ops, crew_ops, db_session)
+            timings['registry'] = time.perf_counter() - stage
 
-        return jsonify({"status": "success", "message": "Waybill entry logged successfully"}), 201
+            stage = time.perf_counter()
+            if records:
+                mongo.db.waybills.insert_many(records, ordered=False, session=db_session)
+            timings['insert'] = time.perf_counter() - stage
+            return changed
+
+        buses_changed, crew_changed = _run_write_unit(write)
+        for record in records:
+            live_stats_cache.record(record)
+        if buses_changed:
+            for data in accepted_data:
+                bus_suggestions.upsert({"bus_reg_no": data['busRegNo'], "service_category": data.get('serviceCategory')})
+        if buses_changed or crew_changed:
+            _reference_bundles.clear()
+        if crew_changed:
+            _crew_written(crew_ops)
+        timings['total'] = time.perf_counter() - started
+
+        # idempotencyKey -> waybill id, the same id however often an entry is replayed
+        ids = {key: str(doc_id) for key, doc_id in stored_ids.items()}
+        ids.update({r['idempotency_key']: str(r['_id']) for r in records if r.get('idempotency_key')})
+
+        timings_ms = {k: round(v * 1000, 2) for k, v in timings.items()}
+        response = jsonify({
+            "status": "success",
+            "inserted": len(records),
+            "accepted": [r['idempotency_key'] for r in records if r.get('idempotency_key')],
+            "duplicates": sorted(str(k) for k in set(duplicates)),
+            "ids": ids,
+            "rejected": rejected,
+            "timings_ms": timings_ms
+        })
+        response.headers['Server-Timing'] = ", ".join(
+            f"{k};dur={v}" for k, v in timings_ms.items()
+        )
+        return response, 201 if records else 200
 
     except Exception as e:
-        print(f"ERROR in /api/waybill: {str(e)}")
+        print(f"ERROR in /api/waybill/batch: {str(e)}")
         return jsonify({"status": "error", "message": f"Server error: {str(e)}"}), 500
 
+# Delta polls re-read this far behind the cursor, so a waybill committed a
+# little late by another worker is still picked up (the client drops repeats by id).
+LIVE_CURSOR_OVERLAP = timedelta(seconds=int(os.getenv("LIVE_CURSOR_OVERLAP_SECONDS", "30")))
+
+def _parse_live_cursor(since, start_of_day, now):
+    """Returns the cursor timestamp, or None if it is missing or not from today."""
+    if not since:
+        return None
+    try:
+        cursor_time = datetime.fromisoformat(since)
+    except ValueError:
+        return None
+    if cursor_time < start_of_day or cursor_time > now + LIVE_CURSOR_OVERLAP:
+        return None
+    return cursor_time
+
+def _load_depot_day_stats(depot_id, day):
+    """Builds a depot's stats for one day from its waybills (cache miss path)."""
+    start = datetime(day.year, day.month, day.day, 0, 0, 0)
+    stats = DepotDayStats()
+    for row in mongo.db.waybills.aggregate(
+        depot_day_stats_pipeline(depot_id, start, start + timedelta(days=1))
+    ):
+        stats.total = row['total']
+        stats.on_time = row['on_time']
+        stats.buses = set(row['buses'])
+        stats.platforms = {str(p) for p in row['platforms'] if p not in (None, '')}
+    return stats
+
+# Live-data stats per depot per day, kept current by the waybill write path
+live_stats_cache = StatsCache(
+    _load_depot_day_stats,
+    ttl=int(os.getenv("STATS_CACHE_TTL_SECONDS", "60"))
+)
+
 @app.route('/api/live-data', methods=['GET'])
 def get_live_data():
     if 'user' not in session:
@@ -180,14 +501,7 @@ def get_live_data():
     
     try:
         depot_id = session['user']['depot_id']
-        depot_name = session['user'].get('depot_name', '')
         
-        # Fetch waybills where this depot is the source OR the destination
-        # We check destination against both depot_id and depot_name for robustness
-        # Strict Isolation: Only show waybills created BY this depot
-        # The user said "data is duplicated in all depos", implying they don't want to see incoming buses yet, 
-        # or the generic destination matching was too broad. 
-        # let's restrict to just records logged at this depot for now to solve the "duplication".
         # Strict Isolation: Only show waybills created BY this depot
         # LIMIT: Only show content for the CURRENT DAY (Resets at midnight)
         now = datetime.now()
@@ -197,94 +511,185 @@ def get_live_data():
             "depot_id": depot_id,
             "timestamp": {"$gte": start_of_day}
         }
+
+        # ?since=<cursor> returns only rows newer than the cursor (minus a small overlap).
+        # A missing or stale cursor (e.g. from yesterday) gets a full reload.
+        cursor_time = _parse_live_cursor(request.args.get('since'), start_of_day, now)
+        full = cursor_time is None
+        if not full:
+            query["timestamp"] = {"$gte": max(start_of_day, cursor_time - LIVE_CURSOR_OVERLAP)}
         
-        cursor = mongo.db.waybills.find(query).sort("timestamp", -1)
-        waybills = list(cursor)
-        
-        # Convert ObjectId to string for JSON serialization if needed, 
-        # but PyMongo's jsonify usually handles it or we manually helper.
-        # Let's create a clean list of dicts.
-        data_list = []
-        on_time_count = 0
+        waybills = list(mongo.db.waybills.find(query, LIVE_VIEW.projection).sort("timestamp", -1))
         
-        for wb in waybills:
-            # Basic stats logic
-            if wb.get('actualTime') and wb.get('scheduledTime'):
-                if wb['actualTime'] <= wb['scheduledTime']:
-                    on_time_count += 1
-            
-            # Prepare dict for JSON
-            item = {
-                "busRegNo": wb.get('busRegNo', ''),
-                "serviceCategory": wb.get('serviceCategory', ''),
-                "origin": wb.get('origin', ''),
-                "destination": wb.get('destination', ''),
-                "scheduledTime": wb.get('scheduledTime', ''),
-                "actualTime": wb.get('actualTime', ''),
-                "movementType": wb.get('movementType', ''),
-                "platformNumber": wb.get('platformNumber', ''),
-                "depot_id": wb.get('depot_id', '')
-            }
-            data_list.append(item)
-            
-        # Punctuality Score
-        total = len(waybills)
-        punctuality = 0
-        if total > 0:
-            punctuality = round((on_time_count / total) * 100, 1)
-            
-        # Active Fleet (approximate based on unique buses in list)
-        unique_buses = set(wb.get('busRegNo') for wb in waybills)
-        active_fleet = len(unique_buses)
+        data_list = LIVE_VIEW.serialize_many(waybills)
+
+        # Stats always cover the whole day and come from the per-depot cache
+        stats = live_stats_cache.get(depot_id, start_of_day.date(), len(session['user'].get('platforms', [])))
+
+        # Next cursor is the newest timestamp seen so far
+        next_cursor = request.args.get('since') if not full else None
+        if waybills and waybills[0].get('timestamp'):
+            newest = waybills[0]['timestamp']
+            if full or newest > cursor_time:
+                next_cursor = newest.isoformat()
 
         return jsonify({
             "status": "success",
+            "full": full,
+            "cursor": next_cursor,
             "waybills": data_list,
-            "stats": {
-                "active_fleet": active_fleet,
-                "punctuality": punctuality,
-                "utilization": 76 # Placeholder/Mock for now as per original design
-            }
+            "stats": stats
         }), 200
 
     except Exception as e:
         print(f"ERROR in /api/live-data: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# One waybill watcher per process, fanned out to every open dashboard of a depot
+live_feed = LiveFeedHub(
+    lambda: mongo.db.waybills,
+    LIVE_VIEW.serialize,
+    projection=LIVE_VIEW.projection,
+    poll_interval=float(os.getenv("LIVE_FEED_POLL_SECONDS", "2")),
+    poll_overlap=LIVE_CURSOR_OVERLAP
+)
+LIVE_STREAM_HEARTBEAT = int(os.getenv("LIVE_STREAM_HEARTBEAT_SECONDS", "15"))
+# auto: stream only under a gevent/eventlet worker; on/off force it
+LIVE_STREAM_MODE = os.getenv("LIVE_STREAM", "auto")
+
+def _cooperative_sockets():
+    """True once gevent or eventlet has patched socket (gunicorn -k gevent/eventlet)."""
+    for module, check in (("gevent.monkey", "is_module_patched"), ("eventlet.patcher", "is_monkey_patched")):
+        patcher = sys.modules.get(module)
+        if patcher is not None and getattr(patcher, check)('socket'):
+            return True
+    return False
+
+def _live_stream_enabled():
+    if LIVE_STREAM_MODE in ('on', 'off'):
+        return LIVE_STREAM_MODE == 'on'
+    return _cooperative_sockets()
+
+@app.route('/api/live-stream', methods=['GET'])
+def live_stream():
+    """
+    Server-Sent Events: one "waybill" event per insert at the user's depot.
+    Each open stream holds its request for as long as the tab is open, so
+    under sync/gthread workers (one request per thread, killed after the
+    gunicorn timeout) it answers 204 instead: EventSource then stops
+    reconnecting and the dashboard keeps polling /api/live-data.
+    """
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    if not _live_stream_enabled():
+        return Response(status=204)
+
+    depot_id = session['user']['depot_id']
+    subscriber = live_feed.subscribe(depot_id)
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    row = subscriber.get(timeout=LIVE_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: waybill\nid: {row['id']}\ndata: {json.dumps(row)}\n\n"
+        finally:
+            live_feed.unsubscribe(depot_id, subscriber)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Page size for /api/bus-history (?limit= may lower or raise it up to the max)
+BUS_HISTORY_PAGE_SIZE = 50
+BUS_HISTORY_MAX_PAGE_SIZE = 500
+
+def _parse_history_cursor(before):
+    """Decodes a "<timestamp>_<id>" keyset cursor; raises ValueError if malformed."""
+    timestamp, _, doc_id = before.rpartition('_')
+    return datetime.fromisoformat(timestamp), ObjectId(doc_id)
+
 @app.route('/api/bus-history/<bus_no>', methods=['GET'])
 def get_bus_history(bus_no):
     if 'user' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
     
     try:
-        # Fetch all waybills for this specific bus across ALL depots
-        cursor = mongo.db.waybills.find({"busRegNo": bus_no}).sort("timestamp", -1)
-        waybills = list(cursor)
-        
-        data_list = []
-        for wb in waybills:
-            item = {
-                "busRegNo": wb.get('busRegNo', ''),
-                "serviceCategory": wb.get('serviceCategory', ''),
-                "origin": wb.get('origin', ''),
-                "destination": wb.get('destination', ''),
-                "scheduledTime": wb.get('scheduledTime', ''),
-                "actualTime": wb.get('actualTime', ''),
-                "movementType": wb.get('movementType', ''),
-                "depot_id": wb.get('depot_id', ''),
-                "platformNumber": wb.get('platformNumber', '')
-            }
-            data_list.append(item)
-            
-        return jsonify({
-            "status": "success",
-            "waybills": data_list
-        }), 200
+        try:
+            limit = min(int(request.args.get('limit', BUS_HISTORY_PAGE_SIZE)), BUS_HISTORY_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = BUS_HISTORY_PAGE_SIZE
+        limit = max(limit, 1)
+
+        # Fetch waybills for this specific bus across ALL depots, one page at a time.
+        # ?before=<cursor> continues after the last row of the previous page.
+        query = {"busRegNo": bus_no}
+        before = request.args.get('before')
+        if before:
+            try:
+                before_time, before_id = _parse_history_cursor(before)
+            except Exception:
+                return jsonify({"status": "error", "message": "Invalid cursor"}), 400
+            query["$or"] = [
+                {"timestamp": {"$lt": before_time}},
+                {"timestamp": before_time, "_id": {"$lt": before_id}}
+            ]
+
+        projection = dict(HISTORY_VIEW.projection, _id=1, timestamp=1)
+        cursor = mongo.db.waybills.find(query, projection) \
+            .sort([("timestamp", -1), ("_id", -1)]) \
+            .limit(limit + 1)
+
+        def stream():
+            # Rows are written as the cursor yields them, never held as a full list
+            yield '{"status": "success", "waybills": ['
+            count = 0
+            last = None
+            for wb in cursor:
+                if count == limit:
+                    break
+                yield (',' if count else '') + json.dumps(HISTORY_VIEW.serialize(wb), default=str)
+                last = wb
+                count += 1
+            else:
+                last = None # Cursor ran out: no further page
+
+            next_cursor = None
+            if last is not None and last.get('timestamp'):
+                next_cursor = f"{last['timestamp'].isoformat()}_{last['_id']}"
+            yield '], "next": ' + json.dumps(next_cursor) + '}'
+
+        return Response(stream(), mimetype='application/json'), 200
 
     except Exception as e:
         print(f"ERROR in /api/bus-history: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def _attach_crew(waybills):
+    """
+    Fills in crew names/phones from the crew collection (one query per page),
+    since waybills only hold conductorId/driverId. Values still on legacy
+    documents win.
+    """
+    crew_ids = {wb[key] for wb in waybills for key in ('conductorId', 'driverId') if wb.get(key)}
+    if not crew_ids:
+        return waybills
+    crew = {c['crew_id']: c for c in mongo.db.crew.find(
+        {"crew_id": {"$in": list(crew_ids)}}, {"_id": 0, "crew_id": 1, "name": 1, "phone": 1})}
+    for wb in waybills:
+        for prefix in ('conductor', 'driver'):
+            member = crew.get(wb.get(f'{prefix}Id'), {})
+            for field, source in (('Name', 'name'), ('Phone', 'phone')):
+                if member.get(source):
+                    wb.setdefault(f'{prefix}{field}', member[source])
+    return waybills
+
 @app.route('/api/search', methods=['GET'])
 def search_records():
     if 'user' not in session:
@@ -301,13 +706,28 @@ def search_records():
         query = {}
         
         if bus_no:
-            query["busRegNo"] = {"$regex": bus_no, "$options": "i"}
+            # Start or end of the bus number ("KL-15", "1102"), matched on indexed keys
+            bus_query = bus_key_query(bus_no)
+            if bus_query is None:
+                return jsonify({"status": "success", "count": 0, "waybills": []}), 200
+            query.update(bus_query)
             
         if depot_id:
             query["depot_id"] = depot_id
             
         if movement_type:
             query["movementType"] = movement_type
+
+        # ?minDelay=/&maxDelay= in minutes (negative = early), e.g. minDelay=15 for late runs
+        delay_range = {}
+        for param, op in (("minDelay", "$gte"), ("maxDelay", "$lte")):
+            if request.args.get(param):
+                try:
+                    delay_range[op] = int(request.args[param])
+                except ValueError:
+                    return jsonify({"status": "error", "message": f"{param} must be a whole number of minutes"}), 400
+        if delay_range:
+            query["delay_minutes"] = delay_range
             
         # Date filtering needs care - stored as UTC timestamps in waybills
         # For simplicity, if date is provided, we'll try to match the day
@@ -321,33 +741,8 @@ def search_records():
             except ValueError:
                 pass # Ignore malformed date
                 
-        cursor = mongo.db.waybills.find(query).sort("timestamp", -1).limit(100)
-        waybills = list(cursor)
-        
-        data_list = []
-        for wb in waybills:
-            item = {
-                "busRegNo": wb.get('busRegNo', ''),
-                "serviceCategory": wb.get('serviceCategory', ''),
-                "origin": wb.get('origin', ''),
-                "destination": wb.get('destination', ''),
-                "scheduledTime": wb.get('scheduledTime', ''),
-                "actualTime": wb.get('actualTime', ''),
-                "movementType": wb.get('movementType', ''),
-                "depot_id": wb.get('depot_id', ''),
-                "timestamp": wb.get('timestamp').strftime("%Y-%m-%d %H:%M") if wb.get('timestamp') else '',
-                # Crew Details
-                "conductorName": wb.get('conductorName', '-'),
-                "conductorId": wb.get('conductorId', '-'),
-                "driverName": wb.get('driverName', '-'),
-                "driverId": wb.get('driverId', '-'),
-                # Explicit Arrival/Departure for clarity in search
-                "arrival_time": wb.get('actualTime') if wb.get('movementType') == 'Arrival' else '-',
-                "departure_time": wb.get('actualTime') if wb.get('movementType') == 'Departure' else '-',
-                "conductorPhone": wb.get('conductorPhone', ''),
-                "driverPhone": wb.get('driverPhone', '')
-            }
-            data_list.append(item)
+        waybills = list(mongo.db.waybills.find(query, SEARCH_VIEW.projection).sort("timestamp", -1).limit(100))
+        data_list = SEARCH_VIEW.serialize_many(_attach_crew(waybills))
             
         return jsonify({
             "status": "success",
@@ -372,39 +767,9 @@ def get_master_log():
         start = datetime(now.year, now.month, now.day, 0, 0, 0)
         end = datetime(now.year, now.month, now.day, 23, 59, 59)
         
-        # Fetch all waybills for THIS depot today
-        cursor = mongo.db.waybills.find({
-            "depot_id": depot_id,
-            "timestamp": {"$gte": start, "$lte": end}
-        }).sort("scheduledTime", 1)
-        
-        waybills = list(cursor)
+        # Fetch all waybills for THIS depot today, status computed server-side
+        data_list = list(mongo.db.waybills.aggregate(master_log_pipeline(depot_id, start, end)))
         
-        data_list = []
-        for wb in waybills:
-            # Determine status
-            status = "On Time"
-            status_class = "bg-success"
-            
-            if wb.get('actualTime') > wb.get('scheduledTime'):
-                status = "Delayed"
-                status_class = "bg-danger"
-            elif not wb.get('actualTime'):
-                status = "Scheduled"
-                status_class = "bg-info"
-
-            data_list.append({
-                "busRegNo": wb.get('busRegNo', ''),
-                "serviceCategory": wb.get('serviceCategory', ''),
-                "route": f"{wb.get('origin', '')} - {wb.get('destination', '')}",
-                "scheduledTime": wb.get('scheduledTime', ''),
-                "actualTime": wb.get('actualTime', '-'),
-                "movementType": wb.get('movementType', ''),
-                "status": status,
-                "statusClass": status_class,
-                "alerts": "PF-" + str(wb.get('platformNumber', '-'))
-            })
-            
         return jsonify({
             "status": "success",
             "date": now.strftime("%b %d, %Y"),
@@ -415,15 +780,159 @@ def get_master_log():
         print(f"ERROR in /api/master-log: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route('/test_db')
-def test_db():
+# Background job keeping depot_daily_stats current (ROLLUP_INTERVAL_SECONDS=0 disables it).
+# Started on the first request so the thread belongs to the serving worker.
+ROLLUP_INTERVAL = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+_rollup_worker = None
+
+@app.before_request
+def _ensure_rollup_worker():
+    global _rollup_worker
+    if ROLLUP_INTERVAL > 0 and _rollup_worker is None:
+        _rollup_worker = start_rollup_worker(mongo.db, ROLLUP_INTERVAL)
+
+# Longest date range a report may cover
+REPORT_MAX_DAYS = 366
+
+def _report_range():
+    """Parses ?from=&to= (YYYY-MM-DD, default last 7 days); raises ValueError when invalid."""
+    today = datetime.now()
+    today = datetime(today.year, today.month, today.day)
+    end = datetime.strptime(request.args['to'], "%Y-%m-%d") if request.args.get('to') else today
+    start = datetime.strptime(request.args['from'], "%Y-%m-%d") if request.args.get('from') else end - timedelta(days=6)
+    if start > end or (end - start).days >= REPORT_MAX_DAYS:
+        raise ValueError(f"Date range must be ascending and at most {REPORT_MAX_DAYS} days")
+    return start, end
+
+@app.route('/api/reports/daily', methods=['GET'])
+def report_daily():
+    """One precomputed depot_daily_stats row per day for the user's depot."""
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        start, end = _report_range()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
     try:
-        # User flask_pymongo to ping the database
-        mongo.db.command('ping')
-        return jsonify({"status": "success", "message": "Connected to MongoDB!"}), 200
+        days = list(mongo.db.depot_daily_stats.find(
+            {"depot_id": session['user']['depot_id'], "date": {"$gte": start, "$lte": end}},
+            {"_id": 0, "buses": 0}
+        ).sort("date", 1))
+        for day in days:
+            day['date'] = day['date'].strftime("%Y-%m-%d")
+            day['updated_at'] = day['updated_at'].isoformat() if day.get('updated_at') else None
+        return jsonify({"status": "success", "days": days}), 200
+
     except Exception as e:
+        print(f"ERROR in /api/reports/daily: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/reports/summary', methods=['GET'])
+def report_summary():
+    """Totals over a date range, combined from the daily rollups."""
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        start, end = _report_range()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        days = list(mongo.db.depot_daily_stats.find(
+            {"depot_id": session['user']['depot_id'], "date": {"$gte": start, "$lte": end}},
+            {"_id": 0, "total": 1, "on_time": 1, "by_route": 1, "buses": 1,
+             "fleet_utilization": 1, "platform_utilization": 1}
+        ))
+
+        total = sum(d.get('total', 0) for d in days)
+        on_time = sum(d.get('on_time', 0) for d in days)
+        routes = {}
+        for d in days:
+            for r in d.get('by_route', []):
+                bucket = routes.setdefault(r['route'], {"route": r['route'], "total": 0, "on_time": 0})
+                bucket['total'] += r['total']
+                bucket['on_time'] += r['on_time']
+        for bucket in routes.values():
+            bucket['on_time_pct'] = round(bucket['on_time'] / bucket['total'] * 100, 1) if bucket['total'] else 0
+
+        def average(field):
+            values = [d[field] for d in days if d.get(field) is not None]
+            return round(sum(values) / len(values), 1) if values else 0
+
+        return jsonify({
+            "status": "success",
+            "from": start.strftime("%Y-%m-%d"),
+            "to": end.strftime("%Y-%m-%d"),
+            "days": len(days),
+            "total": total,
+            "on_time": on_time,
+            "on_time_pct": round(on_time / total * 100, 1) if total else 0,
+            "unique_buses": len({b for d in days for b in d.get('buses', [])}),
+            "avg_fleet_utilization": average('fleet_utilization'),
+            "avg_platform_utilization": average('platform_utilization'),
+            "routes": sorted(routes.values(), key=lambda r: r['total'], reverse=True)
+        }), 200
+
+    except Exception as e:
+        print(f"ERROR in /api/reports/summary: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# A heartbeat older than this no longer counts as "connected"
+READINESS_MAX_AGE = int(os.getenv("READINESS_MAX_AGE_SECONDS", "30"))
+
+@app.route('/test_db')
+def test_db():
+    # Answered from the driver's background heartbeats, not a ping per call
+    ready, details = mongo.readiness(max_age=READINESS_MAX_AGE)
+    if ready:
+        return jsonify({"status": "success", "message": "Connected to MongoDB!", **details}), 200
+    return jsonify({"status": "error", "message": details.get('error', 'MongoDB unavailable'), **details}), 503
+
+@app.route('/readyz')
+def readyz():
+    ready, details = mongo.readiness(max_age=READINESS_MAX_AGE)
+    return jsonify(dict(details, ready=ready)), 200 if ready else 503
+
+def _bus_suggestion(doc):
+    bus_key = doc.get('bus_key') or normalize_bus_key(doc['bus_reg_no'])
+    item = {"bus_reg_no": doc['bus_reg_no'], "service_category": doc.get('service_category')}
+    # Whole key doubles as the "code", so a full bus number ranks first
+    return doc['bus_reg_no'], item, bus_key, [bus_key]
+
+def _place_suggestion(doc):
+    name = doc.get('name') or ''
+    code = (doc.get('code') or '').lower()
+    item = {"name": name, "code": doc.get('code')}
+    return name, item, code, [t for t in (name.lower(), code) if t]
+
+AUTOCOMPLETE_TTL = int(os.getenv("AUTOCOMPLETE_TTL_SECONDS", "300"))
+
+# Suggestions served from memory; save_waybill and admin edits keep them current
+bus_suggestions = AutocompleteIndex(
+    lambda: mongo.db.buses.find(
+        {"bus_reg_no": {"$type": "string"}},
+        {"_id": 0, "bus_reg_no": 1, "service_category": 1, "bus_key": 1}
+    ),
+    _bus_suggestion,
+    normalize_bus_key,
+    ttl=AUTOCOMPLETE_TTL
+)
+place_suggestions = AutocompleteIndex(
+    lambda: mongo.db.places.find({"name": {"$type": "string"}}, {"_id": 0, "name": 1, "code": 1}),
+    _place_suggestion,
+    lambda q: q.strip().lower(),
+    ttl=AUTOCOMPLETE_TTL
+)
+
+def _suggestions_response(results):
+    response = jsonify(results)
+    # Reference data changes rarely; let the browser reuse results for repeat keystrokes
+    response.headers['Cache-Control'] = f'private, max-age={min(AUTOCOMPLETE_TTL, 300)}'
+    return response
+
 @app.route('/api/search/bus', methods=['GET'])
 def search_bus():
     if 'user' not in session:
@@ -433,12 +942,7 @@ def search_bus():
     if not query:
         return jsonify([])
 
-    results = mongo.db.buses.find(
-        {"bus_reg_no": {"$regex": query, "$options": "i"}},
-        {"_id": 0, "bus_reg_no": 1, "service_category": 1}
-    ).limit(10)
-    
-    return jsonify(list(results))
+    return _suggestions_response(bus_suggestions.search(query))
 
 @app.route('/api/search/place', methods=['GET'])
 def search_place():
@@ -449,22 +953,124 @@ def search_place():
     if not query:
         return jsonify([])
 
-    # Search in places collection
-    results = mongo.db.places.find(
-        {"name": {"$regex": query, "$options": "i"}},
-        {"_id": 0, "name": 1, "code": 1}
-    ).limit(10)
-    
-    return jsonify(list(results))
+    return _suggestions_response(place_suggestions.search(query))
+
+REFERENCE_BUNDLE_TTL = int(os.getenv("REFERENCE_BUNDLE_TTL_SECONDS", "60"))
+
+# (depot_id, platforms) -> (expires_at, version, raw JSON bytes, {encoding: compressed bytes})
+_reference_bundles = {}
+
+def _build_reference_bundle(user):
+    """
+    Compact snapshot of what the waybill form looks up: places and buses as
+    [name, code] / [reg_no, category] pairs, and crew_id -> [name, phone, role]
+    for crew seen at this depot (plus crew not yet tied to any depot).
+    """
+    depot_id = user['depot_id']
+    places = [
+        [p['name'], p.get('code')]
+        for p in mongo.db.places.find({"name": {"$type": "string"}}, {"_id": 0, "name": 1, "code": 1}).sort("name", 1)
+    ]
+    buses = [
+        [b['bus_reg_no'], b.get('service_category')]
+        for b in mongo.db.buses.find({"bus_reg_no": {"$type": "string"}}, {"_id": 0, "bus_reg_no": 1, "service_category": 1}).sort("bus_reg_no", 1)
+    ]
+    crew = {
+        c['crew_id']: [c.get('name'), c.get('phone'), c.get('role')]
+        for c in mongo.db.crew.find(
+            {"$or": [{"depot_ids": depot_id}, {"depot_ids": {"$exists": False}}]},
+            {"_id": 0, "crew_id": 1, "name": 1, "phone": 1, "role": 1}
+        )
+    }
+    body = {
+        "places": places,
+        "buses": buses,
+        "crew": crew,
+        "platforms": user.get('platforms', [])
+    }
+    raw = json.dumps(body, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16], raw
+
+def _compress(raw, encoding):
+    if encoding == 'br':
+        return brotli.compress(raw)
+    return gzip.compress(raw, compresslevel=6)
+
+@app.route('/api/reference-bundle', methods=['GET'])
+def reference_bundle():
+    if 'user' not in session:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        user = session['user']
+        key = (user['depot_id'], tuple(user.get('platforms', [])))
+        cached = _reference_bundles.get(key)
+        if not cached or cached[0] <= time.monotonic():
+            version, raw = _build_reference_bundle(user)
+            # Keep the compressed copies if the content did not change
+            encoded = cached[3] if cached and cached[1] == version else {}
+            cached = (time.monotonic() + REFERENCE_BUNDLE_TTL, version, raw, encoded)
+            _reference_bundles[key] = cached
+        _, version, raw, encoded = cached
+
+        # no-cache: the browser keeps the body and revalidates it with If-None-Match
+        headers = {
+            "ETag": f'"{version}"',
+            "Cache-Control": "private, no-cache",
+            "Vary": "Accept-Encoding, Cookie"
+        }
+        if request.if_none_match.contains(version):
+            return Response(status=304, headers=headers)
+
+        # Quality-aware: "gzip;q=0" refuses gzip
+        accepted = request.accept_encodings
+        encoding = 'br' if brotli and accepted['br'] else 'gzip' if accepted['gzip'] else None
+        if encoding:
+            if encoding not in encoded:
+                encoded[encoding] = _compress(raw, encoding)
+            headers["Content-Encoding"] = encoding
+            return Response(encoded[encoding], mimetype='application/json', headers=headers)
+        return Response(raw, mimetype='application/json', headers=headers)
+
+    except Exception as e:
+        print(f"ERROR in /api/reference-bundle: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+# crew_id -> crew document (or MISSING) for /api/crew/<crew_id>
+crew_cache = LRUTTLCache(
+    maxsize=int(os.getenv("CREW_CACHE_SIZE", "2048")),
+    ttl=int(os.getenv("CREW_CACHE_TTL_SECONDS", "600")),
+    negative_ttl=int(os.getenv("CREW_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+)
+# Bumped on every crew write so the other workers drop their crew_cache too
+crew_version = SharedVersion(
+    lambda: mongo.db.cache_versions, "crew",
+    check_interval=int(os.getenv("CREW_CACHE_CHECK_SECONDS", "5"))
+)
+
+def _crew_written(crew_ids=None):
+    """Drops cached crew after a write: these ids here (all if None), everything on the other workers."""
+    if crew_ids is None:
+        crew_cache.clear()
+    else:
+        for crew_id in crew_ids:
+            crew_cache.invalidate(crew_id)
+    crew_version.bump()
 
 @app.route('/api/crew/<crew_id>', methods=['GET'])
 def get_crew_details(crew_id):
     if 'user' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
-    crew = mongo.db.crew.find_one({"crew_id": crew_id}, {"_id": 0})
+    # Same few hundred IDs repeat all day; unknown IDs are cached too (briefly)
+    if crew_version.changed():
+        crew_cache.clear() # Written by another worker
+    crew = crew_cache.get(crew_id)
+    if crew is None:
+        crew = mongo.db.crew.find_one({"crew_id": crew_id}, {"_id": 0}) or MISSING
+        crew_cache.set(crew_id, crew)
     
-    if crew:
+    if crew is not MISSING:
         return jsonify({"status": "success", "crew": crew})
     else:
         return jsonify({"status": "error", "message": "Crew not found"}), 404
@@ -482,6 +1088,7 @@ def admin_login():
         password = request.form.get('password')
         
         if admin_id == ADMIN_ID and password == ADMIN_PASSWORD:
+            session.regenerate()
             session['is_admin'] = True
             return redirect(url_for('admin_dashboard'))
         else:
@@ -495,37 +1102,88 @@ def admin_dashboard():
         return redirect(url_for('admin_login'))
     return render_template('admin_dashboard.html')
 
+catalog_stats = CatalogStats(
+    lambda: mongo.db,
+    ttl=int(os.getenv("ADMIN_STATS_TTL", "30")),
+    exact_ttl=int(os.getenv("ADMIN_EXACT_COUNTS_TTL", "600"))
+)
+
 @app.route('/api/admin/stats')
 def admin_stats():
     if not session.get('is_admin'):
         return jsonify({"error": "Unauthorized"}), 401
     
-    stats = {
-        "collections": mongo.db.list_collection_names(),
-        "counts": {}
-    }
-    for col in stats['collections']:
-        stats['counts'][col] = mongo.db[col].count_documents({})
+    # Estimated from collection metadata; ?exact=1 also starts (or returns) exact counts
+    stats = dict(catalog_stats.get(), estimated=True)
+    if request.args.get('exact') == '1':
+        exact = catalog_stats.exact()
+        if exact:
+            stats.update(counts=exact['counts'], estimated=False, exact_computed_at=exact['computed_at'])
+        else:
+            catalog_stats.request_exact()
+            stats['exact_status'] = 'running'
     
     return jsonify(stats)
 
+def _invalidate_caches_for(collection_name):
+    """Drops caches derived from a collection an admin just edited (crew on every worker)."""
+    catalog_stats.invalidate()
+    if collection_name == 'waybills':
+        # Edited rows may change today's counts
+        live_stats_cache.invalidate()
+    elif collection_name == 'buses':
+        bus_suggestions.invalidate()
+    elif collection_name == 'places':
+        place_suggestions.invalidate()
+    if collection_name in ('buses', 'places', 'crew'):
+        _reference_bundles.clear()
+    if collection_name == 'crew':
+        # Admin edits address rows by _id, so drop every cached crew lookup
+        _crew_written()
+
+@app.route('/api/admin/cache-stats')
+def admin_cache_stats():
+    if not session.get('is_admin'):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify({
+        "crew": crew_cache.stats(),
+        "mongo_pool": mongo.pool_stats.snapshot()
+    })
+
 @app.route('/api/admin/data/<collection_name>', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def admin_data(collection_name):
     if not session.get('is_admin'):
         return jsonify({"error": "Unauthorized"}), 401
     
     col = mongo.db[collection_name]
+    # Writes below drop derived caches only once they have succeeded, so a
+    # reader cannot refill a cache from the old data in between
     
     if request.method == 'GET':
-        data = list(col.find().limit(100)) # Limit to prevent overload
+        # One keyset page at a time; see admin_query.py for the parameters
+        try:
+            data, next_cursor, sort_field = browse(col, collection_name, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         for item in data:
             item['_id'] = str(item['_id'])
-        return jsonify(data)
+        return jsonify({
+            "items": data,
+            "next": next_cursor,
+            "sort": sort_field,
+            "sortable": SORTABLE_FIELDS.get(collection_name, []),
+            # From collection metadata: cheap, but ignores filters
+            "estimated_total": col.estimated_document_count()
+        })
     
     elif request.method == 'POST':
         try:
             new_data = request.json
+            if collection_name == 'users' and 'stationMasterId' in new_data:
+                new_data['stationMasterId_lower'] = normalize_station_master_id(new_data['stationMasterId'])
             result = col.insert_one(new_data)
+            _invalidate_caches_for(collection_name)
             return jsonify({"status": "success", "id": str(result.inserted_id)}), 201
         except Exception as e:
             return jsonify({"error": str(e)}), 400
@@ -537,9 +1195,12 @@ def admin_data(collection_name):
             doc_id = update_data.pop('_id', None)
             if not doc_id:
                 return jsonify({"error": "Document ID required"}), 400
+            if collection_name == 'users' and 'stationMasterId' in update_data:
+                update_data['stationMasterId_lower'] = normalize_station_master_id(update_data['stationMasterId'])
             
             from bson.objectid import ObjectId
             result = col.update_one({"_id": ObjectId(doc_id)}, {"$set": update_data})
+            _invalidate_caches_for(collection_name)
             return jsonify({"status": "success", "modified": result.modified_count})
         except Exception as e:
              return jsonify({"error": str(e)}), 400
@@ -552,10 +1213,27 @@ def admin_data(collection_name):
             
             from bson.objectid import ObjectId
             result = col.delete_one({"_id": ObjectId(doc_id)})
+            _invalidate_caches_for(collection_name)
             return jsonify({"status": "success", "deleted": result.deleted_count})
         except Exception as e:
             return jsonify({"error": str(e)}), 400
 
+# Uploads larger than this run as a background job (also forced with ?background=1)
+IMPORT_BACKGROUND_BYTES = int(os.getenv("IMPORT_BACKGROUND_BYTES", str(5 * 1024 * 1024)))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+
+def _invalidate_after_import(collection_name):
+    _invalidate_caches_for(collection_name)
+    if collection_name == 'waybills':
+        _invalidate_caches_for('crew') # Imported waybills add the crew they name
+
+def _finish_background_import(path, collection_name):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    _invalidate_after_import(collection_name)
+
 @app.route('/api/admin/upload/<collection_name>', methods=['POST'])
 def admin_upload(collection_name):
     if not session.get('is_admin'):
@@ -567,26 +1245,95 @@ def admin_upload(collection_name):
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
-    
-    if file:
-        import csv
-        import io
-        
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_input = csv.DictReader(stream)
-        
-        documents = []
-        for row in csv_input:
-            documents.append(row)
-        
-        if documents:
-            try:
-                result = mongo.db[collection_name].insert_many(documents)
-                return jsonify({"status": "success", "count": len(result.inserted_ids)})
-            except Exception as e:
-                return jsonify({"error": str(e)}), 500
-        
-        return jsonify({"status": "success", "count": 0})
+
+    # ?mode=upsert updates existing rows keyed on crew_id / bus_reg_no / station master / place name
+    mode = request.args.get('mode', 'insert')
+    if mode not in ('insert', 'upsert'):
+        return jsonify({"error": "mode must be insert or upsert"}), 400
+    if mode == 'upsert' and collection_name not in UPSERT_KEYS:
+        return jsonify({"error": f"Upsert is not supported for {collection_name}"}), 400
+    try:
+        chunk_size = max(1, min(int(request.args.get('chunk_size', IMPORT_CHUNK_SIZE)), 10000))
+    except ValueError:
+        return jsonify({"error": "chunk_size must be a number"}), 400
+
+    job_id = create_job(mongo.db, collection_name, mode, file.filename)
+
+    background = request.args.get('background') == '1' or (request.content_length or 0) > IMPORT_BACKGROUND_BYTES
+    if background:
+        # Spool to disk so the job outlives the request
+        fd, path = tempfile.mkstemp(suffix='.csv', prefix='import-')
+        os.close(fd)
+        file.save(path)
+        start_import(mongo.db, job_id, collection_name, path, mode, chunk_size, on_done=lambda p: _finish_background_import(p, collection_name))
+        return jsonify({"status": "accepted", "job_id": job_id}), 202
+
+    result = run_import(mongo.db, job_id, collection_name, file.stream, mode, chunk_size)
+    _invalidate_after_import(collection_name)
+    if result['status'] != 'completed':
+        return jsonify(dict(result, error="Import failed", job_id=job_id)), 500
+    return jsonify(dict(result, status="success", job_id=job_id,
+                        count=result['inserted'] + result['upserted'] + result['updated']))
+
+@app.route('/api/admin/upload/status/<job_id>', methods=['GET'])
+def admin_upload_status(job_id):
+    if not session.get('is_admin'):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    job = mongo.db.import_jobs.find_one({"_id": job_id})
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    job['job_id'] = job.pop('_id')
+    job['count'] = job['inserted'] + job['upserted'] + job['updated']
+    return jsonify(job)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+@app.route('/api/admin/export/<collection_name>', methods=['GET'])
+def admin_export(collection_name):
+    if not session.get('is_admin'):
+        return jsonify({"error": "Unauthorized"}), 401
+    if collection_name not in EXPORTABLE:
+        return jsonify({"error": f"Export is not supported for {collection_name}"}), 400
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        batch_size = max(1, min(int(request.args.get('batch_size', EXPORT_BATCH_SIZE)), 10000))
+    except ValueError:
+        return jsonify({"error": "batch_size must be a number"}), 400
+
+    # ?depot_id=&from=YYYY-MM-DD&to=YYYY-MM-DD&movementType=&fields=a,b,c
+    depot_id = request.args.get('depot_id')
+    try:
+        query = build_export_query(
+            collection_name,
+            depot_id=depot_id,
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            movement_type=request.args.get('movementType')
+        )
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+    fields = parse_fields(collection_name, request.args.get('fields'))
+    projection = build_projection(collection_name, fields)
+
+    write_chunks, mimetype = FORMATS[fmt]
+    cursor = export_cursor(mongo.db[collection_name], query, projection, batch_size, fields)
+    body = write_chunks(cursor, fields or DEFAULT_FIELDS.get(collection_name))
+
+    compressed = request.args.get('gzip') == '1'
+    headers = {
+        "Content-Disposition": f"attachment; filename={export_filename(collection_name, fmt, depot_id, compressed)}",
+        "Cache-Control": "no-store"
+    }
+    if compressed:
+        body = gzip_chunks(body)
+        mimetype = "application/gzip"
+    else:
+        body = (chunk.encode('utf-8') for chunk in body)
+    return Response(body, mimetype=mimetype, headers=headers)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,118 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+class AutocompleteIndex:
+    """
+    In-process suggestion index for a small, slow-changing collection
+    (places, the bus registry).
+
+    Entries are kept as a sorted list of (term, id) so a prefix lookup is a
+    bisect. Results are ranked: exact code match first, then prefix matches,
+    then substring matches.
+
+    loader() returns the documents to index; make_entry(doc) returns
+    (id, item, code, terms) where item is what the API returns and code/terms
+    are already normalized the way normalize(query) normalizes user input.
+    The index is built lazily (after any gunicorn fork), rebuilt every ttl
+    seconds so changes made by other workers show up, and can be updated in
+    place with upsert().
+    """
+
+    def __init__(self, loader, make_entry, normalize, ttl=300, limit=10):
+        self.loader = loader
+        self.make_entry = make_entry
+        self.normalize = normalize
+        self.ttl = ttl
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._codes = {}
+        self._terms = []
+        self._expires_at = 0
+
+    def _build(self):
+        entries = {}
+        codes = {}
+        terms = []
+        for doc in self.loader():
+            entry_id, item, code, entry_terms = self.make_entry(doc)
+            entries[entry_id] = (item, code, entry_terms)
+            if code:
+                codes.setdefault(code, []).append(entry_id)
+            terms.extend((term, entry_id) for term in entry_terms)
+        terms.sort()
+        with self._lock:
+            self._entries = entries
+            self._codes = codes
+            self._terms = terms
+            self._expires_at = time.monotonic() + self.ttl
+
+    def _ensure_fresh(self):
+        if time.monotonic() >= self._expires_at:
+            self._build()
+
+    def invalidate(self):
+        """Forces a rebuild on the next search (e.g. after an admin edit)."""
+        with self._lock:
+            self._expires_at = 0
+
+    def upsert(self, doc):
+        """Adds or replaces one entry without rebuilding the whole index."""
+        entry_id, item, code, entry_terms = self.make_entry(doc)
+        with self._lock:
+            if not self._expires_at:
+                return # Not built yet: the first search loads it from the database
+            self._remove(entry_id)
+            self._entries[entry_id] = (item, code, entry_terms)
+            if code:
+                self._codes.setdefault(code, []).append(entry_id)
+            for term in entry_terms:
+                insort(self._terms, (term, entry_id))
+
+    def _remove(self, entry_id):
+        old = self._entries.pop(entry_id, None)
+        if not old:
+            return
+        _, code, entry_terms = old
+        if code and entry_id in self._codes.get(code, []):
+            self._codes[code].remove(entry_id)
+        for term in entry_terms:
+            i = bisect_left(self._terms, (term, entry_id))
+            if i < len(self._terms) and self._terms[i] == (term, entry_id):
+                del self._terms[i]
+
+    def search(self, query):
+        self._ensure_fresh()
+        q = self.normalize(query)
+        if not q:
+            return []
+
+        with self._lock:
+            found = []
+            seen = set()
+
+            def take(entry_id):
+                if entry_id not in seen:
+                    seen.add(entry_id)
+                    found.append(self._entries[entry_id][0])
+                return len(found) >= self.limit
+
+            # 1. Exact code ("EKM")
+            for entry_id in self._codes.get(q, []):
+                if take(entry_id):
+                    return found
+
+            # 2. Prefix, in sorted order
+            i = bisect_left(self._terms, (q,))
+            while i < len(self._terms) and self._terms[i][0].startswith(q):
+                if take(self._terms[i][1]):
+                    return found
+                i += 1
+
+            # 3. Substring anywhere
+            for term, entry_id in self._terms:
+                if q in term and take(entry_id):
+                    return found
+
+            return found
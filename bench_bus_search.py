@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from normalize import bus_key_fields, bus_key_query
+
+# Bus number search on a synthetic waybill collection: the old unanchored
+# case-insensitive $regex against the indexed bus_key/bus_key_rev lookups.
+# Writes to a scratch collection (bench_waybills) that is dropped afterwards.
+# Usage: python bench_bus_search.py [rows]
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+if not MONGO_URI:
+    print("Error: MONGO_URI not found in .env file.")
+    exit(1)
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BATCH = 10_000
+QUERIES = ["KL-15-A", "kl15a11", "1102", "4321", "H-98"]
+
+def bus_number(rng):
+    return f"KL-{rng.randint(1, 99):02d}-{rng.choice('ABCDEFGH')}-{rng.randint(1000, 9999)}"
+
+def seed(col):
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=365)
+    for offset in range(0, ROWS, BATCH):
+        docs = []
+        for i in range(offset, min(offset + BATCH, ROWS)):
+            bus = bus_number(rng)
+            docs.append({
+                "busRegNo": bus,
+                **bus_key_fields(bus),
+                "depot_id": "TVM",
+                "timestamp": start + timedelta(seconds=i * 30),
+            })
+        col.insert_many(docs, ordered=False)
+    col.create_index([("bus_key", ASCENDING), ("timestamp", DESCENDING)])
+    col.create_index([("bus_key_rev", ASCENDING), ("timestamp", DESCENDING)])
+
+def timed(col, query):
+    started = time.perf_counter()
+    count = len(list(col.find(query, {"_id": 0, "busRegNo": 1}).sort("timestamp", -1).limit(100)))
+    return (time.perf_counter() - started) * 1000, count
+
+if __name__ == '__main__':
+    col = MongoClient(MONGO_URI).get_database().bench_waybills
+    col.drop()
+    try:
+        print(f"Seeding {ROWS} waybills...")
+        seed(col)
+        print(f"{'query':10s} {'regex ms':>10s} {'indexed ms':>11s}")
+        for text in QUERIES:
+            regex_ms, _ = timed(col, {"busRegNo": {"$regex": text, "$options": "i"}})
+            indexed_ms, _ = timed(col, bus_key_query(text))
+            print(f"{text:10s} {regex_ms:10.1f} {indexed_ms:11.1f}")
+    finally:
+        col.drop()
@@ -0,0 +1,125 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# How many concurrent dashboard clients one running instance sustains.
+#
+# Each simulated client logs in as a station master, then loops: poll
+# /api/live-data (delta feed) every POLL_SECONDS, and in between type a few
+# autocomplete keystrokes and look up a crew member, like the waybill form.
+# Concurrency is raised step by step until p95 latency goes over the target
+# or errors appear; the last step that held is the sustained client count.
+#
+# Run it once per serving mode against the same database, e.g.
+#   GUNICORN_WORKER_CLASS=sync   gunicorn -c gunicorn.conf.py app:app
+#   GUNICORN_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py app:app
+# Usage: python bench_dashboard_clients.py [base_url]
+# Login: BENCH_DEPOT, BENCH_STATION_MASTER, BENCH_PASSWORD (a seeded user)
+
+BASE_URL = (sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8000").rstrip('/')
+DEPOT = os.getenv("BENCH_DEPOT", "TVM")
+STATION_MASTER = os.getenv("BENCH_STATION_MASTER", "SM_TVM_001")
+PASSWORD = os.getenv("BENCH_PASSWORD", "password")
+
+STEPS = [10, 25, 50, 100, 200, 400]
+STEP_SECONDS = 20
+POLL_SECONDS = 5
+P95_TARGET_MS = 500
+QUERIES = ["KL", "KL-15", "EKM", "Tri", "Kol", "1102"]
+
+class Client(threading.Thread):
+    def __init__(self, stop, results, lock):
+        super().__init__(daemon=True)
+        self.stop = stop
+        self.results = results
+        self.lock = lock
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.rng = random.Random()
+
+    def call(self, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = Request(BASE_URL + path, data=data, headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        ok = True
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                payload = response.read()
+        except HTTPError as e:
+            ok = e.code == 404 # Unknown crew ids are an answer, not a failure
+            payload = b''
+        except (URLError, OSError):
+            ok = False
+            payload = b''
+        elapsed = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.results.append((elapsed, ok))
+        return payload
+
+    def run(self):
+        self.call("/login", {"depotId": DEPOT, "stationMasterId": STATION_MASTER, "password": PASSWORD})
+        cursor = None
+        # Spread the clients over the poll interval like real dashboards
+        time.sleep(self.rng.uniform(0, POLL_SECONDS))
+        while not self.stop.is_set():
+            next_poll = time.monotonic() + POLL_SECONDS
+            payload = self.call("/api/live-data" + (f"?since={cursor}" if cursor else ""))
+            try:
+                cursor = json.loads(payload).get('cursor') or cursor
+            except ValueError:
+                pass
+            query = self.rng.choice(QUERIES)
+            for i in range(1, len(query) + 1):
+                self.call(f"/api/search/bus?q={query[:i]}")
+            self.call(f"/api/search/place?q={query[:3]}")
+            self.call(f"/api/crew/C{self.rng.randint(1, 500)}")
+            self.stop.wait(max(0, next_poll - time.monotonic()))
+
+def run_step(clients):
+    stop = threading.Event()
+    results = []
+    lock = threading.Lock()
+    threads = [Client(stop, results, lock) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(POLL_SECONDS) # Let logins and first polls settle
+    with lock:
+        results.clear()
+    time.sleep(STEP_SECONDS)
+    with lock:
+        sample = list(results)
+    stop.set()
+    for t in threads:
+        t.join(timeout=30)
+
+    latencies = sorted(ms for ms, _ in sample)
+    errors = sum(1 for _, ok in sample if not ok)
+    p = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))] if latencies else 0
+    return {
+        "rps": len(sample) / STEP_SECONDS,
+        "p50": p(50),
+        "p95": p(95),
+        "error_rate": errors / len(sample) if sample else 1
+    }
+
+if __name__ == '__main__':
+    probe = Client(threading.Event(), [], threading.Lock())
+    if b'"success"' not in probe.call("/login", {"depotId": DEPOT, "stationMasterId": STATION_MASTER, "password": PASSWORD}):
+        print(f"Error: cannot log in to {BASE_URL} as {STATION_MASTER} ({DEPOT}).")
+        exit(1)
+
+    print(f"--- Dashboard clients against {BASE_URL} ---")
+    print(f"{'clients':>8s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'errors':>7s}")
+    sustained = 0
+    for clients in STEPS:
+        r = run_step(clients)
+        print(f"{clients:8d} {r['rps']:8.1f} {r['p50']:8.1f} {r['p95']:8.1f} {r['error_rate']:7.1%}")
+        if r['p95'] > P95_TARGET_MS or r['error_rate'] > 0.01:
+            break
+        sustained = clients
+    print(f"Sustained: {sustained} clients (p95 <= {P95_TARGET_MS} ms, errors <= 1%)")
@@ -0,0 +1,95 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from flask import render_template, session
+from pymongo import ASCENDING, DESCENDING, MongoClient
+
+# Render time of the index page as a depot's waybill history grows: the old
+# home() query (every waybill the depot ever logged, full documents) against
+# the bounded, projected, today-only slice. Writes to a scratch collection
+# (bench_waybills) that is dropped afterwards.
+# Usage: python bench_home_render.py [max_rows]
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+if not MONGO_URI:
+    print("Error: MONGO_URI not found in .env file.")
+    exit(1)
+
+import app as appmod # After the env check: importing app connects with MONGO_URI
+
+MAX_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+SIZES = [n for n in (1_000, 10_000, 50_000, 200_000, 1_000_000) if n <= MAX_ROWS]
+TODAY_ROWS = 300 # A busy depot's day
+DEPOT = "BENCH"
+REPEAT = 5
+
+def waybill(rng, timestamp):
+    delay = rng.randint(0, 20)
+    return {
+        "busRegNo": f"KL-15-A-{rng.randint(1000, 9999)}",
+        "serviceCategory": "Super Fast",
+        "origin": "Thiruvananthapuram",
+        "destination": "Ernakulam",
+        "viaRoute": "Kollam",
+        "scheduled_min": 600,
+        "actual_min": 600 + delay,
+        "delay_minutes": delay,
+        "movementType": rng.choice(["Arrival", "Departure"]),
+        "platformNumber": rng.randint(1, 20),
+        "conductorId": "C1001",
+        "driverId": "D2001",
+        "depot_id": DEPOT,
+        "logged_by": "SM_BENCH",
+        "timestamp": timestamp,
+    }
+
+def grow_to(col, rows, rng):
+    """Adds history (before today) until the depot has rows waybills."""
+    start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    have = col.count_documents({})
+    batch = []
+    for i in range(have, rows):
+        batch.append(waybill(rng, start_of_day - timedelta(seconds=30 * (i + 1))))
+        if len(batch) == 10_000:
+            col.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        col.insert_many(batch, ordered=False)
+
+def old_home(col):
+    return list(col.find({"depot_id": DEPOT}).sort("timestamp", -1))
+
+def new_home(col):
+    return appmod._home_waybills(col, DEPOT, datetime.now())
+
+def timed_render(fetch, col):
+    best = None
+    for _ in range(REPEAT):
+        with appmod.app.test_request_context('/'):
+            session['user'] = {"depot_id": DEPOT, "station_master_id": "SM_BENCH", "depot_name": "Bench", "platforms": [1, 2]}
+            started = time.perf_counter()
+            html = render_template('index.html', waybills=fetch(col))
+            elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(html)
+
+if __name__ == '__main__':
+    col = MongoClient(MONGO_URI).get_database().bench_waybills
+    col.drop()
+    col.create_index([("depot_id", ASCENDING), ("timestamp", DESCENDING)])
+    rng = random.Random(42)
+    try:
+        now = datetime.now()
+        col.insert_many([waybill(rng, now - timedelta(seconds=i + 1)) for i in range(min(TODAY_ROWS, now.hour * 3600))])
+        print(f"{'history':>9s} {'old ms':>9s} {'old KB':>8s} {'new ms':>8s} {'new KB':>7s}")
+        for size in SIZES:
+            grow_to(col, size, rng)
+            old_ms, old_bytes = timed_render(old_home, col)
+            new_ms, new_bytes = timed_render(new_home, col)
+            print(f"{size:9d} {old_ms:9.1f} {old_bytes / 1024:8.0f} {new_ms:8.1f} {new_bytes / 1024:7.0f}")
+    finally:
+        col.drop()
@@ -0,0 +1,95 @@
+import sys
+import timeit
+from datetime import datetime
+from bson.objectid import ObjectId
+from serializers import HISTORY_VIEW, LIVE_VIEW, SEARCH_VIEW
+
+# Per-row serialization cost of the waybill views against the hand-copied
+# dicts the endpoints used before. No database needed.
+# Usage: python bench_serializers.py [rows]
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+def make_doc(i):
+    # A full stored waybill, as the endpoints used to fetch it
+    return {
+        "_id": ObjectId(),
+        "busRegNo": f"KL-15-A-{1000 + i % 40}",
+        "serviceCategory": "Super Fast",
+        "origin": "Thiruvananthapuram",
+        "destination": "Ernakulam",
+        "via": "Kollam",
+        "scheduledTime": "10:00",
+        "actualTime": "10:05",
+        "movementType": "Departure" if i % 2 else "Arrival",
+        "platformNumber": 1 + i % 20,
+        "conductorId": "C1001",
+        "conductorName": "Rajesh Kumar",
+        "conductorPhone": "9876543210",
+        "driverId": "D2001",
+        "driverName": "Mohan Lal",
+        "driverPhone": "8765432109",
+        "idempotency_key": "bench",
+        "timestamp": datetime.now(),
+        "logged_by": "SM_TVM_001",
+        "depot_id": "TVM",
+    }
+
+def legacy_search_row(wb):
+    return {
+        "busRegNo": wb.get('busRegNo', ''),
+        "serviceCategory": wb.get('serviceCategory', ''),
+        "origin": wb.get('origin', ''),
+        "destination": wb.get('destination', ''),
+        "scheduledTime": wb.get('scheduledTime', ''),
+        "actualTime": wb.get('actualTime', ''),
+        "movementType": wb.get('movementType', ''),
+        "depot_id": wb.get('depot_id', ''),
+        "timestamp": wb.get('timestamp').strftime("%Y-%m-%d %H:%M") if wb.get('timestamp') else '',
+        "conductorName": wb.get('conductorName', '-'),
+        "conductorId": wb.get('conductorId', '-'),
+        "driverName": wb.get('driverName', '-'),
+        "driverId": wb.get('driverId', '-'),
+        "arrival_time": wb.get('actualTime') if wb.get('movementType') == 'Arrival' else '-',
+        "departure_time": wb.get('actualTime') if wb.get('movementType') == 'Departure' else '-',
+        "conductorPhone": wb.get('conductorPhone', ''),
+        "driverPhone": wb.get('driverPhone', '')
+    }
+
+def legacy_history_row(wb):
+    return {
+        "busRegNo": wb.get('busRegNo', ''),
+        "serviceCategory": wb.get('serviceCategory', ''),
+        "origin": wb.get('origin', ''),
+        "destination": wb.get('destination', ''),
+        "scheduledTime": wb.get('scheduledTime', ''),
+        "actualTime": wb.get('actualTime', ''),
+        "movementType": wb.get('movementType', ''),
+        "depot_id": wb.get('depot_id', ''),
+        "platformNumber": wb.get('platformNumber', '')
+    }
+
+def project(doc, projection):
+    # What the server sends back for a projected find
+    return {k: v for k, v in doc.items() if projection.get(k)}
+
+def per_row_us(fn, docs):
+    best = min(timeit.repeat(lambda: [fn(d) for d in docs], number=1, repeat=5))
+    return best / len(docs) * 1e6
+
+if __name__ == '__main__':
+    docs = [make_doc(i) for i in range(ROWS)]
+
+    for name, view, legacy in (
+        ("history", HISTORY_VIEW, legacy_history_row),
+        ("search", SEARCH_VIEW, legacy_search_row),
+        ("live", LIVE_VIEW, None),
+    ):
+        projected = [project(d, view.projection) for d in docs]
+        fields_before = len(docs[0])
+        fields_after = len(projected[0])
+        line = f"{name:8s} fields fetched {fields_before:2d} -> {fields_after:2d}"
+        if legacy:
+            line += f"  legacy {per_row_us(legacy, docs):.2f}us/row"
+        line += f"  view {per_row_us(view.serialize, projected):.2f}us/row"
+        print(line)
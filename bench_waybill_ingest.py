@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import uuid
+from dotenv import load_dotenv
+
+# Compares one-at-a-time POST /api/waybill against POST /api/waybill/batch
+# using the Flask test client. Saving a waybill also writes buses, crew and
+# sessions, so the app is pointed at a scratch database next to the one in
+# MONGO_URI ("<name>_bench"), which is dropped afterwards.
+# Usage: python bench_waybill_ingest.py [count] [batch_size]
+
+load_dotenv()
+
+if not os.getenv("MONGO_URI"):
+    print("Error: MONGO_URI not found in .env file.")
+    exit(1)
+
+def scratch_uri(uri, suffix="_bench"):
+    """uri with its database renamed; credentials keep authenticating where they did."""
+    base, _, options = uri.partition('?')
+    scheme, _, rest = base.partition('://')
+    hosts, _, database = rest.partition('/')
+    # Without authSource, credentials use the URI's database (admin if none);
+    # mongodb+srv takes it from DNS instead
+    if '@' in hosts and scheme == 'mongodb' and 'authsource=' not in options.lower():
+        options = "&".join(filter(None, [options, f"authSource={database or 'admin'}"]))
+    return f"{scheme}://{hosts}/{database or 'test'}{suffix}" + (f"?{options}" if options else "")
+
+# Before importing app, which reads these at import time
+os.environ["MONGO_URI"] = scratch_uri(os.environ["MONGO_URI"])
+os.environ["ROLLUP_INTERVAL_SECONDS"] = "0"
+
+from app import app, mongo
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+BATCH_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+BENCH_DEPOT = "BENCH"
+
+def make_waybill(i):
+    return {
+        "busRegNo": f"KL-15-A-{1000 + i % 40}",
+        "serviceCategory": "Super Fast",
+        "origin": "Thiruvananthapuram",
+        "destination": "Ernakulam",
+        "scheduledTime": "10:00",
+        "actualTime": "10:05",
+        "movementType": "Departure" if i % 2 else "Arrival",
+        "platformNumber": str(1 + i % 20),
+        "conductorId": f"C{1000 + i % 10}",
+        "conductorName": "Bench Conductor",
+        "conductorPhone": "9000000000",
+        "driverId": f"D{2000 + i % 10}",
+        "driverName": "Bench Driver",
+        "driverPhone": "8000000000",
+        "idempotencyKey": str(uuid.uuid4())
+    }
+
+def logged_in_client():
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user'] = {
+            "depot_id": BENCH_DEPOT,
+            "station_master_id": "SM_BENCH_001",
+            "depot_name": "Benchmark Depot",
+            "platforms": list(range(1, 21))
+        }
+    return client
+
+def bench_single(client):
+    started = time.perf_counter()
+    for i in range(COUNT):
+        client.post('/api/waybill', json=make_waybill(i))
+    return time.perf_counter() - started
+
+def bench_batch(client):
+    started = time.perf_counter()
+    for offset in range(0, COUNT, BATCH_SIZE):
+        batch = [make_waybill(i) for i in range(offset, min(offset + BATCH_SIZE, COUNT))]
+        client.post('/api/waybill/batch', json={"waybills": batch})
+    return time.perf_counter() - started
+
+if __name__ == '__main__':
+    client = logged_in_client()
+    try:
+        single = bench_single(client)
+        batch = bench_batch(client)
+        print(f"{COUNT} waybills")
+        print(f"  single /api/waybill:       {single:.2f}s  ({COUNT / single:.0f} waybills/s)")
+        print(f"  batch  /api/waybill/batch: {batch:.2f}s  ({COUNT / batch:.0f} waybills/s, batch size {BATCH_SIZE})")
+    finally:
+        mongo.cx.drop_database(mongo.db.name)
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime
+
+def _collection_stats(db, name):
+    """
+    Count and sizes for one collection from its metadata ($collStats), which
+    costs the same however many documents it holds. Falls back to
+    estimated_document_count() where $collStats is not allowed.
+    """
+    try:
+        stats = next(db[name].aggregate([{"$collStats": {"storageStats": {}}}]))['storageStats']
+        return {
+            "count": stats.get('count', 0),
+            "size": stats.get('size', 0),
+            "storage_size": stats.get('storageSize', 0),
+            "index_size": stats.get('totalIndexSize', 0),
+            "avg_obj_size": stats.get('avgObjSize', 0),
+            "indexes": stats.get('nindexes', 0)
+        }
+    except Exception:
+        return {
+            "count": db[name].estimated_document_count(),
+            "size": None,
+            "storage_size": None,
+            "index_size": None,
+            "avg_obj_size": None,
+            "indexes": None
+        }
+
+class CatalogStats:
+    """
+    Collection list and per-collection counts/sizes for the admin dashboard.
+
+    The estimated snapshot is rebuilt at most every ttl seconds. Exact counts
+    (a count_documents({}) per collection) are opt-in: request_exact() runs
+    them in a background thread and exact() returns the last result for
+    exact_ttl seconds. get_db() returns the database to inspect.
+    """
+
+    def __init__(self, get_db, ttl=30, exact_ttl=600):
+        self.get_db = get_db
+        self.ttl = ttl
+        self.exact_ttl = exact_ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._expires_at = 0
+        self._exact = None
+        self._exact_expires_at = 0
+        self._exact_running = False
+
+    def get(self):
+        with self._lock:
+            if self._snapshot and self._expires_at > time.monotonic():
+                return self._snapshot
+
+        db = self.get_db()
+        names = sorted(db.list_collection_names())
+        details = {name: _collection_stats(db, name) for name in names}
+        snapshot = {
+            "collections": names,
+            "counts": {name: d['count'] for name, d in details.items()},
+            "details": details,
+            "generated_at": datetime.now().isoformat()
+        }
+        with self._lock:
+            self._snapshot = snapshot
+            self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    def exact(self):
+        """Last exact counts if still fresh, else None."""
+        with self._lock:
+            if self._exact and self._exact_expires_at > time.monotonic():
+                return self._exact
+            return None
+
+    def request_exact(self):
+        """Starts a background exact count unless one is running or fresh. Returns True if started."""
+        with self._lock:
+            if self._exact_running or (self._exact and self._exact_expires_at > time.monotonic()):
+                return False
+            self._exact_running = True
+
+        def work():
+            try:
+                db = self.get_db()
+                counts = {name: db[name].count_documents({}) for name in db.list_collection_names()}
+                with self._lock:
+                    self._exact = {"counts": counts, "computed_at": datetime.now().isoformat()}
+                    self._exact_expires_at = time.monotonic() + self.exact_ttl
+            except Exception as e:
+                print(f"ERROR: Exact collection counts failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._exact_running = False
+
+        threading.Thread(target=work, name="exact-counts", daemon=True).start()
+        return True
+
+    def invalidate(self):
+        """Drops the estimated snapshot (e.g. after an import or a dropped collection)."""
+        with self._lock:
+            self._expires_at = 0
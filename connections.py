@@ -0,0 +1,244 @@
+import importlib.util
+import os
+import threading
+import time
+from flask_pymongo import BSONObjectIdConverter, BSONProvider
+from pymongo import MongoClient, monitoring
+
+# MongoDB client for app.py, in place of flask_pymongo.PyMongo.
+#
+# The MongoClient is created on first use in each process and re-created in
+# a forked child (gunicorn workers, with or without --preload), so no worker
+# ever shares the master's sockets or monitor threads. Pool size, timeouts
+# and wire compression come from the environment; pool checkouts and server
+# heartbeats are recorded for /metrics and the readiness probe.
+
+# Environment variable -> MongoClient option
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_HEARTBEAT_FREQUENCY_MS": ("heartbeatFrequencyMS", int),
+    "MONGO_APP_NAME": ("appname", str),
+}
+
+# Fail fast when the server is unreachable instead of pymongo's 30 s
+DEFAULT_OPTIONS = {"serverSelectionTimeoutMS": 5000, "appname": "rtc-digi"}
+
+# Wire compressor -> module pymongo needs for it (zlib is always available)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+def available_compressors(requested):
+    """Keeps the requested compressors whose libraries are installed, in order."""
+    names = [c.strip() for c in requested.split(',') if c.strip()]
+    return [c for c in names if c in COMPRESSOR_MODULES
+            and (COMPRESSOR_MODULES[c] is None or importlib.util.find_spec(COMPRESSOR_MODULES[c]))]
+
+def client_options_from_env():
+    options = dict(DEFAULT_OPTIONS)
+    for env, (option, cast) in CLIENT_OPTIONS.items():
+        if os.getenv(env):
+            options[option] = cast(os.getenv(env))
+    # Negotiated with the server: the first one both sides support is used
+    compressors = available_compressors(os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib"))
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Checkout counts, wait times and open connections for this process's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = {}
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self.checked_out = 0
+            self.connections_open = 0
+            self.connections_created = 0
+            self.pool_clears = 0
+
+    def connection_checked_out(self, event):
+        wait = event.duration or 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_check_out_started(self, event): pass
+    def connection_ready(self, event): pass
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_ms_avg": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "checked_out": self.checked_out,
+                "connections_open": self.connections_open,
+                "connections_created": self.connections_created,
+                "pool_clears": self.pool_clears
+            }
+
+    def prometheus_lines(self):
+        s = self.snapshot()
+        lines = [
+            "# HELP mongodb_pool_checkouts_total Connections checked out of the pool.",
+            "# TYPE mongodb_pool_checkouts_total counter",
+            f"mongodb_pool_checkouts_total {s['checkouts']}",
+            "# HELP mongodb_pool_checkout_failures_total Failed checkouts by reason (e.g. timeout).",
+            "# TYPE mongodb_pool_checkout_failures_total counter",
+        ]
+        lines += [f'mongodb_pool_checkout_failures_total{{reason="{r}"}} {n}' for r, n in sorted(s['checkout_failures'].items())]
+        lines += [
+            "# HELP mongodb_pool_wait_seconds_total Time spent waiting for a pooled connection.",
+            "# TYPE mongodb_pool_wait_seconds_total counter",
+            f"mongodb_pool_wait_seconds_total {s['wait_seconds_total']}",
+            "# HELP mongodb_pool_checked_out Connections currently in use.",
+            "# TYPE mongodb_pool_checked_out gauge",
+            f"mongodb_pool_checked_out {s['checked_out']}",
+            "# HELP mongodb_pool_connections Open pooled connections.",
+            "# TYPE mongodb_pool_connections gauge",
+            f"mongodb_pool_connections {s['connections_open']}",
+        ]
+        return lines
+
+class Heartbeats(monitoring.ServerHeartbeatListener):
+    """Last result of the driver's own background server checks, for readiness."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last_ok = None # monotonic time
+        self.last_rtt_ms = None
+        self.last_error = None
+        self.last_error_at = None
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            self.last_ok = time.monotonic()
+            self.last_rtt_ms = round(event.duration * 1000, 3)
+
+    def failed(self, event):
+        with self._lock:
+            self.last_error = str(event.reply)
+            self.last_error_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return self.last_ok, self.last_rtt_ms, self.last_error, self.last_error_at
+
+class MongoConnection:
+    """
+    Drop-in for the parts of PyMongo app.py uses: .cx (the client) and .db
+    (the URI's default database), both created lazily per process.
+    """
+
+    def __init__(self, app=None, uri=None, event_listeners=(), **options):
+        self.uri = uri
+        self.options = options
+        self.pool_stats = PoolStats()
+        self.heartbeats = Heartbeats()
+        self.event_listeners = list(event_listeners) + [self.pool_stats, self.heartbeats]
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self._ready_cache = (0, None) # (expires_at, result) of the last active ping
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        if app is not None:
+            self.init_app(app, uri)
+
+    def init_app(self, app, uri=None):
+        self.uri = uri or self.uri or app.config.get("MONGO_URI")
+        if not self.uri:
+            raise ValueError("You must specify a URI or set the MONGO_URI Flask config variable")
+        # Same URL converter and JSON handling (ObjectId, datetime) as flask_pymongo
+        app.url_map.converters["ObjectId"] = BSONObjectIdConverter
+        app.json = BSONProvider(app)
+
+    def _after_fork(self):
+        # The parent's client (sockets, monitor threads) must not be used here
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.pool_stats.reset()
+
+    @property
+    def cx(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = MongoClient(
+                        self.uri,
+                        connect=False,
+                        event_listeners=self.event_listeners,
+                        **self.options
+                    )
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        return self.cx.get_database()
+
+    def readiness(self, max_age=30, ping_cache=5):
+        """
+        (ready, details) from the driver's background heartbeats when one
+        succeeded within max_age seconds. Before the first heartbeat (or
+        after a failure) it pings once and reuses that answer for ping_cache
+        seconds, so probes never queue up round trips.
+        """
+        now = time.monotonic()
+        last_ok, rtt_ms, error, error_at = self.heartbeats.snapshot()
+        if last_ok and now - last_ok <= max_age and not (error_at and error_at > last_ok):
+            return True, {"source": "heartbeat", "age_s": round(now - last_ok, 1), "rtt_ms": rtt_ms}
+
+        expires_at, cached = self._ready_cache
+        if cached and expires_at > now:
+            return cached
+        try:
+            self.cx.admin.command('ping')
+            result = (True, {"source": "ping"})
+        except Exception as e:
+            result = (False, {"source": "ping", "error": str(e) or error})
+        self._ready_cache = (now + ping_cache, result)
+        return result
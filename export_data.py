@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from exporter import DEFAULT_FIELDS, EXPORTABLE, FORMATS, build_export_query, build_projection, export_cursor, export_filename, gzip_chunks, parse_fields
+
+# Offline dump of a collection, same filters and formats as /api/admin/export.
+#
+# Usage: python export_data.py waybills --depot EKM --from 2024-01-01 --to 2024-01-31 --gzip
+#        python export_data.py crew --format ndjson --out crew.ndjson
+
+parser = argparse.ArgumentParser(description="Stream a collection to CSV or NDJSON")
+parser.add_argument("collection", choices=EXPORTABLE)
+parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+parser.add_argument("--depot", help="depot id")
+parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD (waybills)")
+parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD, inclusive (waybills)")
+parser.add_argument("--movement-type", choices=["Arrival", "Departure"])
+parser.add_argument("--fields", help="comma separated field list")
+parser.add_argument("--batch-size", type=int, default=1000)
+parser.add_argument("--gzip", action="store_true")
+parser.add_argument("--out", help="output file (default: generated name, '-' for stdout)")
+args = parser.parse_args()
+
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+if not MONGO_URI:
+    print("Error: MONGO_URI not found in .env file.")
+    exit(1)
+
+db = MongoClient(MONGO_URI).get_database()
+
+try:
+    query = build_export_query(args.collection, args.depot, args.date_from, args.date_to, args.movement_type)
+except ValueError:
+    print("Error: dates must be YYYY-MM-DD.")
+    exit(1)
+fields = parse_fields(args.collection, args.fields)
+
+write_chunks, _ = FORMATS[args.format]
+cursor = export_cursor(db[args.collection], query, build_projection(args.collection, fields), args.batch_size, fields)
+chunks = write_chunks(cursor, fields or DEFAULT_FIELDS.get(args.collection))
+chunks = gzip_chunks(chunks) if args.gzip else (chunk.encode('utf-8') for chunk in chunks)
+
+out_path = args.out or export_filename(args.collection, args.format, args.depot, args.gzip)
+to_stdout = out_path == '-'
+if not to_stdout:
+    print(f"--- Exporting {args.collection} to {out_path} ---")
+
+out = sys.stdout.buffer if to_stdout else open(out_path, 'wb')
+written = 0
+try:
+    for chunk in chunks:
+        out.write(chunk)
+        written += len(chunk)
+finally:
+    if not to_stdout:
+        out.close()
+
+if not to_stdout:
+    print(f"Done. {written} bytes written.")
@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+
+# Gunicorn settings, all overridable from the environment (see render.yaml).
+#
+# The default gevent worker serves each request on a greenlet. gevent
+# patches the sockets pymongo uses, so a /api/live-data poll, autocomplete
+# keystroke or crew lookup waiting on MongoDB yields to other requests
+# instead of holding the whole worker. The SSE stream (/api/live-stream)
+# needs this too: under sync or gthread it answers 204 and dashboards poll.
+#
+#   GUNICORN_WORKER_CLASS        gevent (default), gthread or sync
+#   WEB_CONCURRENCY              worker processes
+#   GUNICORN_WORKER_CONNECTIONS  concurrent requests per gevent worker
+#   GUNICORN_THREADS             threads per gthread worker
+#
+# Usage: gunicorn -c gunicorn.conf.py app:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+# Sessions are server-side (sessions.py), so any number of workers can share a client
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() * 2 + 1, 4))))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+threads = int(os.getenv("GUNICORN_THREADS", "8" if worker_class == "gthread" else "1"))
+
+# Open SSE streams send a heartbeat well inside this
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Load the app in each worker after fork (and after gevent has patched the
+# standard library), never in the master
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") # e.g. "-" for stdout
@@ -0,0 +1,244 @@
+import codecs
+import csv
+import threading
+import uuid
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from normalize import bus_key_fields, normalize_station_master_id
+from waybill_schema import MINUTES_PER_DAY, format_hhmm, normalize_waybill
+
+# Streaming CSV import for /api/admin/upload.
+# Rows are decoded, validated and coerced one at a time and written in
+# chunks, so memory stays flat however large the file is. Progress is kept
+# in the import_jobs collection so any worker can report on a background job.
+
+# Field type coercions per collection (everything else stays a string)
+def _parse_datetime(value):
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(value)
+
+COERCIONS = {
+    "waybills": {"timestamp": _parse_datetime},
+    "users": {"platform_count": int},
+    "buses": {"last_updated": _parse_datetime},
+    "crew": {"last_updated": _parse_datetime},
+}
+
+# Rows missing these are rejected
+REQUIRED_FIELDS = {
+    "waybills": ["busRegNo"],
+    "users": ["stationMasterId", "depotId"],
+    "buses": ["bus_reg_no"],
+    "crew": ["crew_id"],
+    "places": ["name"],
+}
+
+# Upsert mode matches existing documents on this field
+UPSERT_KEYS = {
+    "crew": "crew_id",
+    "buses": "bus_reg_no",
+    "users": "stationMasterId_lower",
+    "places": "name",
+}
+
+# Waybill rows go through waybill_schema.normalize_waybill like the form.
+# Besides the form fields, an export's stored columns are accepted:
+WAYBILL_STORED_FIELDS = ("depot_id", "logged_by", "timestamp") # Kept as they are
+WAYBILL_MINUTE_FIELDS = {"scheduled_min": "scheduledTime", "actual_min": "actualTime"} # Read as HH:MM
+WAYBILL_DERIVED_FIELDS = ("_id", "delay_minutes", "bus_key", "bus_key_rev") # Recomputed, so ignored
+
+# Errors kept on the job for display; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+def _minutes_as_hhmm(key, value):
+    try:
+        minutes = int(value)
+    except ValueError:
+        raise ValueError(f"{key}: cannot convert {value!r}")
+    if not 0 <= minutes < MINUTES_PER_DAY:
+        raise ValueError(f"{key}: {minutes} is not a minute of the day")
+    return format_hhmm(minutes)
+
+def _prepare_waybill(doc):
+    """
+    (waybill, crew rows) for one row: the stored document exactly as the form
+    would write it, plus the crew the row names so they are stored as
+    references rather than on the waybill.
+    """
+    form = {}
+    for key, value in doc.items():
+        if key in WAYBILL_STORED_FIELDS or key in WAYBILL_DERIVED_FIELDS:
+            continue
+        if key in WAYBILL_MINUTE_FIELDS:
+            if WAYBILL_MINUTE_FIELDS[key] not in doc: # An "HH:MM" column wins
+                form[WAYBILL_MINUTE_FIELDS[key]] = _minutes_as_hhmm(key, value)
+        elif key == 'idempotency_key':
+            form.setdefault('idempotencyKey', value)
+        else:
+            form[key] = value # Unknown columns are rejected by normalize_waybill
+    record = normalize_waybill(form)
+    record.update({key: doc[key] for key in WAYBILL_STORED_FIELDS if key in doc})
+    record.setdefault('timestamp', datetime.now())
+
+    crew = []
+    for role, prefix in (("Conductor", "conductor"), ("Driver", "driver")):
+        name, phone = form.get(f'{prefix}Name'), form.get(f'{prefix}Phone')
+        if record.get(f'{prefix}Id') and (name or phone):
+            crew.append({"crew_id": record[f'{prefix}Id'], "name": name, "phone": phone, "role": role})
+    return record, crew
+
+def prepare_row(collection_name, row):
+    """
+    Validates and coerces one CSV row. Returns (document, crew rows to add);
+    only waybill rows name crew. Raises ValueError with a readable message.
+    """
+    doc = {k.strip(): v.strip() for k, v in row.items() if k and v is not None and v.strip() != ''}
+    for field in REQUIRED_FIELDS.get(collection_name, []):
+        if not doc.get(field):
+            raise ValueError(f"{field} is required")
+    for field, coerce in COERCIONS.get(collection_name, {}).items():
+        if field in doc:
+            try:
+                doc[field] = coerce(doc[field])
+            except ValueError:
+                raise ValueError(f"{field}: cannot convert {doc[field]!r}")
+
+    # Derived keys the app writes itself on the normal write paths
+    if collection_name == 'users':
+        doc['stationMasterId_lower'] = normalize_station_master_id(doc['stationMasterId'])
+    elif collection_name == 'buses':
+        doc.update(bus_key_fields(doc['bus_reg_no']))
+    elif collection_name == 'waybills':
+        return _prepare_waybill(doc)
+    return doc, []
+
+def create_job(db, collection_name, mode, filename):
+    job_id = uuid.uuid4().hex
+    db.import_jobs.insert_one({
+        "_id": job_id,
+        "collection": collection_name,
+        "mode": mode,
+        "filename": filename,
+        "status": "running",
+        "rows_read": 0,
+        "inserted": 0,
+        "upserted": 0,
+        "updated": 0,
+        "invalid": 0,
+        "failed": 0,
+        "errors": [],
+        "started_at": datetime.now(),
+        "finished_at": None
+    })
+    return job_id
+
+def _decoded_lines(binary_stream):
+    """
+    Text lines of a binary stream, decoded as they are read. utf-8-sig drops
+    the BOM Excel adds. Works on any object with readline(), including
+    werkzeug's SpooledTemporaryFile uploads, which io.TextIOWrapper rejects
+    before Python 3.11.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    for line in iter(binary_stream.readline, b''):
+        yield decoder.decode(line)
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def run_import(db, job_id, collection_name, binary_stream, mode="insert", chunk_size=1000):
+    """
+    Imports a CSV from a binary stream into collection_name, updating the
+    job document after every chunk. Returns the final counters.
+    """
+    col = db[collection_name]
+    upsert_key = UPSERT_KEYS.get(collection_name) if mode == 'upsert' else None
+    counts = {"rows_read": 0, "inserted": 0, "upserted": 0, "updated": 0, "invalid": 0, "failed": 0}
+    errors = []
+
+    def report(message, row_number=None):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "message": message})
+
+    def flush(chunk, crew):
+        try:
+            if crew:
+                # Before the waybills that reference them; existing rows are kept
+                db.crew.bulk_write([
+                    UpdateOne({"crew_id": crew_id}, {"$setOnInsert": row}, upsert=True)
+                    for crew_id, row in crew.items()
+                ], ordered=False)
+            if upsert_key:
+                result = col.bulk_write([
+                    UpdateOne({upsert_key: doc[upsert_key]}, {"$set": doc}, upsert=True)
+                    for doc in chunk
+                ], ordered=False)
+                counts['upserted'] += result.upserted_count
+                counts['updated'] += result.matched_count
+            else:
+                result = col.insert_many(chunk, ordered=False)
+                counts['inserted'] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details
+            counts['inserted'] += details.get('nInserted', 0)
+            counts['upserted'] += details.get('nUpserted', 0)
+            counts['updated'] += details.get('nMatched', 0)
+            counts['failed'] += len(details.get('writeErrors', []))
+            for err in details.get('writeErrors', [])[:5]:
+                report(err.get('errmsg', 'write error'))
+        db.import_jobs.update_one({"_id": job_id}, {"$set": dict(counts, errors=errors)})
+
+    try:
+        chunk = []
+        crew = {}
+        for row_number, row in enumerate(csv.DictReader(_decoded_lines(binary_stream)), start=2): # Row 1 is the header
+            counts['rows_read'] += 1
+            try:
+                doc, row_crew = prepare_row(collection_name, row)
+            except ValueError as e:
+                counts['invalid'] += 1
+                report(str(e), row_number)
+                continue
+            if upsert_key and not doc.get(upsert_key):
+                counts['invalid'] += 1
+                report(f"{upsert_key} is required for upsert", row_number)
+                continue
+            chunk.append(doc)
+            for member in row_crew:
+                crew.setdefault(member['crew_id'], member)
+            if len(chunk) >= chunk_size:
+                flush(chunk, crew)
+                chunk = []
+                crew = {}
+        if chunk:
+            flush(chunk, crew)
+        status = "completed"
+    except Exception as e:
+        print(f"ERROR: Import {job_id} failed: {str(e)}")
+        report(str(e))
+        status = "failed"
+
+    db.import_jobs.update_one(
+        {"_id": job_id},
+        {"$set": dict(counts, errors=errors, status=status, finished_at=datetime.now())}
+    )
+    return dict(counts, status=status, errors=errors)
+
+def start_import(db, job_id, collection_name, path, mode, chunk_size, on_done=None):
+    """Runs run_import on a saved upload in a daemon thread."""
+    def work():
+        try:
+            with open(path, 'rb') as f:
+                run_import(db, job_id, collection_name, f, mode, chunk_size)
+        finally:
+            if on_done:
+                on_done(path)
+
+    thread = threading.Thread(target=work, name=f"import-{job_id}", daemon=True)
+    thread.start()
+    return thread
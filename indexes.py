@@ -0,0 +1,185 @@
+import os
+import sys
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from normalize import bus_key_query
+
+# Indexes each route in app.py depends on.
+# Every entry: (collection, keys, options). Names are fixed so re-running is idempotent.
+INDEXES = [
+    # /api/live-data, /api/master-log, home(): depot + today's time range
+    ("waybills", [("depot_id", ASCENDING), ("timestamp", DESCENDING)],
+     {"name": "depot_timestamp"}),
+    # /api/bus-history: one bus across all depots, newest first, keyset-paged on (timestamp, _id)
+    ("waybills", [("busRegNo", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+     {"name": "bus_timestamp_id"}),
+    # /api/waybill/batch: replayed offline entries
+    ("waybills", [("idempotency_key", ASCENDING)],
+     {"name": "idempotency_key_unique", "unique": True,
+      "partialFilterExpression": {"idempotency_key": {"$type": "string"}}}),
+    # /api/search: prefix and suffix ("last four digits") bus number lookups
+    ("waybills", [("bus_key", ASCENDING), ("timestamp", DESCENDING)],
+     {"name": "bus_key_timestamp"}),
+    ("waybills", [("bus_key_rev", ASCENDING), ("timestamp", DESCENDING)],
+     {"name": "bus_key_rev_timestamp"}),
+    # /api/search?depotId=&minDelay=&maxDelay=: delay ranges for one depot
+    ("waybills", [("depot_id", ASCENDING), ("delay_minutes", ASCENDING), ("timestamp", DESCENDING)],
+     {"name": "depot_delay_timestamp"}),
+    # rollups.py: waybills logged since the job's watermark; live_feed.py polling;
+    # exports; /api/admin/data?sort=timestamp (keyset on timestamp, _id).
+    # Replaces the single-field "timestamp" index (see RETIRED_INDEXES).
+    ("waybills", [("timestamp", ASCENDING), ("_id", ASCENDING)],
+     {"name": "timestamp_id"}),
+    # /api/admin/data?sort=busRegNo
+    ("waybills", [("busRegNo", ASCENDING), ("_id", ASCENDING)],
+     {"name": "bus_reg_no_id"}),
+    # /api/reports/*: one depot over a date range
+    ("depot_daily_stats", [("depot_id", ASCENDING), ("date", ASCENDING)],
+     {"name": "depot_date"}),
+    # /login: case-insensitive lookup on the normalized id
+    ("users", [("stationMasterId_lower", ASCENDING)],
+     {"name": "station_master_id_lower_unique", "unique": True,
+      "partialFilterExpression": {"stationMasterId_lower": {"$type": "string"}}}),
+    # /api/admin/data?sort=stationMasterId_lower (the unique index above is partial)
+    ("users", [("stationMasterId_lower", ASCENDING), ("_id", ASCENDING)],
+     {"name": "station_master_id_lower_id"}),
+    # /api/crew/<id> and crew upserts on waybill save
+    ("crew", [("crew_id", ASCENDING)],
+     {"name": "crew_id_unique", "unique": True}),
+    # /api/admin/data?sort=crew_id
+    ("crew", [("crew_id", ASCENDING), ("_id", ASCENDING)],
+     {"name": "crew_id_id"}),
+    # /api/reference-bundle: crew seen at a depot
+    ("crew", [("depot_ids", ASCENDING)],
+     {"name": "crew_depot_ids"}),
+    # bus upserts on waybill save
+    ("buses", [("bus_reg_no", ASCENDING)],
+     {"name": "bus_reg_no_unique", "unique": True}),
+    # /api/admin/data?sort=bus_reg_no
+    ("buses", [("bus_reg_no", ASCENDING), ("_id", ASCENDING)],
+     {"name": "bus_reg_no_id"}),
+    # seed_data.py upserts places by name
+    ("places", [("name", ASCENDING)],
+     {"name": "place_name"}),
+    # /api/admin/data?sort=name
+    ("places", [("name", ASCENDING), ("_id", ASCENDING)],
+     {"name": "place_name_id"}),
+    # sessions.py: expired sessions are removed by the server
+    ("sessions", [("expires_at", ASCENDING)],
+     {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+]
+
+def _route_queries():
+    """Representative query per route, used to check the plan each one gets."""
+    now = datetime.now()
+    start_of_day = datetime(now.year, now.month, now.day, 0, 0, 0)
+    return {
+        "/api/live-data": ("waybills",
+                           {"depot_id": "TVM", "timestamp": {"$gte": start_of_day}},
+                           [("timestamp", DESCENDING)]),
+        "/api/master-log": ("waybills",
+                            {"depot_id": "TVM", "timestamp": {"$gte": start_of_day, "$lte": now}},
+                            None),
+        "/api/bus-history": ("waybills",
+                             {"busRegNo": "KL-15-A-1102"},
+                             [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        "/api/search": ("waybills", bus_key_query("1102"), [("timestamp", DESCENDING)]),
+        "/api/search?minDelay": ("waybills",
+                                 {"depot_id": "TVM", "delay_minutes": {"$gte": 15}},
+                                 [("timestamp", DESCENDING)]),
+        "/api/admin/data": ("waybills", {}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        "/login": ("users", {"stationMasterId_lower": "sm_tvm_001"}, None),
+        "/api/crew": ("crew", {"crew_id": "C1001"}, None),
+    }
+
+# Indexes an earlier version created that nothing needs any more. Each is
+# dropped by name, and only while it still has these keys.
+RETIRED_INDEXES = [
+    # Superseded by timestamp_id, which serves the same queries
+    ("waybills", [("timestamp", ASCENDING)], "timestamp"),
+    # Bus autocomplete is served from memory (autocomplete.py)
+    ("buses", [("bus_key", ASCENDING)], "bus_key"),
+    ("buses", [("bus_key_rev", ASCENDING)], "bus_key_rev"),
+]
+
+def ensure_indexes(db):
+    """
+    Creates every declared index, then drops the retired ones. create_index
+    is a no-op when an identical index already exists, so this is safe to
+    run on every startup.
+    Returns a list of (collection, name, error) for indexes that failed.
+    """
+    failures = []
+    for collection, keys, options in INDEXES:
+        try:
+            db[collection].create_index(keys, **options)
+        except OperationFailure as e:
+            # e.g. duplicate crew_id values block the unique index
+            print(f"ERROR: Could not create index {collection}.{options['name']}: {e}")
+            failures.append((collection, options['name'], str(e)))
+    for collection, keys, name in RETIRED_INDEXES:
+        try:
+            existing = db[collection].index_information().get(name)
+            if existing and [tuple(key) for key in existing['key']] == keys:
+                db[collection].drop_index(name)
+                print(f"DEBUG: Dropped retired index {collection}.{name}")
+        except OperationFailure as e:
+            print(f"ERROR: Could not drop index {collection}.{name}: {e}")
+            failures.append((collection, name, str(e)))
+    return failures
+
+def _plan_stages(plan):
+    """Yields every stage name in an explain() winning plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+def check_query_plans(db):
+    """
+    Runs explain() on each route's query.
+    Returns {route: (ok, stages)} where ok means IXSCAN and no COLLSCAN.
+    """
+    results = {}
+    for route, (collection, query, sort) in _route_queries().items():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        winning = explain.get('queryPlanner', {}).get('winningPlan', {})
+        stages = list(_plan_stages(winning))
+        ok = ('IXSCAN' in stages or 'EXPRESS_IXSCAN' in stages) and 'COLLSCAN' not in stages
+        results[route] = (ok, stages)
+    return results
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    MONGO_URI = os.getenv("MONGO_URI")
+    if not MONGO_URI:
+        print("Error: MONGO_URI not found in .env file.")
+        exit(1)
+
+    db = MongoClient(MONGO_URI).get_database()
+
+    print("--- Creating Indexes ---")
+    failures = ensure_indexes(db)
+    for collection, keys, options in INDEXES:
+        print(f"{collection}.{options['name']}: {keys}")
+
+    print("\n--- Checking Query Plans ---")
+    bad = 0
+    for route, (ok, stages) in check_query_plans(db).items():
+        print(f"{'OK  ' if ok else 'SCAN'} {route}: {' <- '.join(stages)}")
+        if not ok:
+            bad += 1
+
+    sys.exit(1 if failures or bad else 0)
@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure, PyMongoError
+
+class LiveFeedHub:
+    """
+    Watches a waybills collection and fans each insert out to the subscribers
+    of its depot_id.
+
+    One watcher per process serves every open dashboard: a change stream when
+    the server supports one, otherwise (standalone mongod, mongomock, any
+    failure to open the stream) a poll every poll_interval seconds. Polls
+    read by timestamp and re-read poll_overlap behind the newest row seen,
+    so rows committed late by other workers are still delivered; rows
+    already sent are skipped by _id. The collection is looked up through
+    get_collection() on use, so the hub can be built before a fork.
+    """
+
+    def __init__(self, get_collection, serialize, projection=None, poll_interval=2.0,
+                 poll_overlap=timedelta(seconds=30), queue_size=100):
+        self.get_collection = get_collection
+        self.serialize = serialize
+        self.projection = projection
+        self.poll_interval = poll_interval
+        self.poll_overlap = poll_overlap
+        self.queue_size = queue_size
+        self.mode = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, depot_id):
+        """Registers a subscriber queue for one depot and starts the watcher if needed."""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(depot_id, set()).add(q)
+            # Started lazily so the thread is created after a gunicorn fork
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, depot_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(depot_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[depot_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def publish(self, doc):
+        """Delivers one waybill to every subscriber of its depot."""
+        with self._lock:
+            targets = list(self._subscribers.get(doc.get('depot_id'), ()))
+        if not targets:
+            return
+        event = self.serialize(doc)
+        for q in targets:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client: it resyncs through the delta feed on its next event
+                pass
+
+    def _run(self):
+        try:
+            self.mode = "change_stream"
+            self._watch_change_stream()
+        except Exception as e:
+            # e.g. OperationFailure 40573 (change streams need a replica set), or no watch() at all
+            print(f"DEBUG: Change stream unavailable ({type(e).__name__}: {e}), polling waybills instead.")
+        self.mode = "polling"
+        self._poll()
+
+    def _watch_change_stream(self):
+        resume_token = None
+        while True:
+            try:
+                with self.get_collection().watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        self.publish(change['fullDocument'])
+            except OperationFailure:
+                raise
+            except PyMongoError as e:
+                print(f"ERROR: Live feed change stream interrupted: {str(e)}")
+                time.sleep(self.poll_interval)
+
+    def _poll_once(self, since, seen, publish=True):
+        """
+        Reads rows with timestamp >= since - poll_overlap, publishing those not
+        in seen (_id -> timestamp). Returns the newest timestamp seen.
+        """
+        projection = dict(self.projection, _id=1, timestamp=1) if self.projection else None
+        window_start = since - self.poll_overlap
+        for doc in self.get_collection().find({"timestamp": {"$gte": window_start}}, projection).sort("timestamp", 1):
+            timestamp = doc.get('timestamp')
+            if doc['_id'] in seen or not isinstance(timestamp, datetime):
+                continue
+            seen[doc['_id']] = timestamp
+            since = max(since, timestamp)
+            if publish:
+                self.publish(doc)
+        # Only ids still inside the overlap window can come back
+        window_start = since - self.poll_overlap
+        for doc_id in [i for i, t in seen.items() if t < window_start]:
+            del seen[doc_id]
+        return since
+
+    def _poll(self):
+        since = datetime.now()
+        seen = {}
+        # Rows already in the window were there before anyone subscribed
+        try:
+            since = self._poll_once(since, seen, publish=False)
+        except Exception as e:
+            print(f"ERROR: Live feed poll failed: {str(e)}")
+        while True:
+            time.sleep(self.poll_interval)
+            if not self.subscriber_count():
+                # Nobody to send the idle period's rows to (reloads fetch them)
+                since = max(since, datetime.now())
+                continue
+            try:
+                since = self._poll_once(since, seen)
+            except Exception as e:
+                print(f"ERROR: Live feed poll failed: {str(e)}")
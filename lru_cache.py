@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Marker stored for keys known not to exist (negative caching)
+MISSING = object()
+
+class LRUTTLCache:
+    """
+    Bounded LRU cache whose entries also expire after a TTL.
+
+    set(key, MISSING) records a lookup that found nothing; those entries use
+    negative_ttl so a newly created row shows up soon after.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, negative_ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached value, MISSING for a cached negative, or None on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is MISSING else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+class SharedVersion:
+    """
+    A counter document (collection cache_versions, _id name) that tells
+    every worker when data behind a per-process cache changed. Writers
+    bump() it; readers call changed() before using their cache, which
+    re-reads the counter at most every check_interval seconds and returns
+    True once whenever it has moved. Other workers therefore see a write
+    within check_interval instead of the cache's full TTL.
+    """
+
+    def __init__(self, get_collection, name, check_interval=5):
+        self.get_collection = get_collection
+        self.name = name
+        self.check_interval = check_interval
+        self._seen = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        self.get_collection().update_one({"_id": self.name}, {"$inc": {"version": 1}}, upsert=True)
+
+    def changed(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+        doc = self.get_collection().find_one({"_id": self.name})
+        version = doc['version'] if doc else 0
+        with self._lock:
+            moved = self._seen is not None and version != self._seen
+            self._seen = version
+        return moved
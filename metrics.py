@@ -0,0 +1,181 @@
+import threading
+import time
+from pymongo import monitoring
+
+# Request and MongoDB metrics in Prometheus text format, served by /metrics.
+#
+# Every worker process keeps its own counters (scrape each worker, or sum
+# them in Prometheus). Database commands are attributed to the route and
+# depot of the request running on the same thread (or greenlet under
+# gevent); commands from background jobs are labelled "background".
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, series in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, values, ('le', bound))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+class Metrics:
+    """All metrics for one process plus the per-request attribution state."""
+
+    def __init__(self):
+        self._current = threading.local()
+
+        self.requests = Counter(
+            "http_requests_total", "HTTP requests by route, method, status and depot.",
+            ("route", "method", "status", "depot"))
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Time to produce the response (streamed bodies excluded).",
+            ("route", "method"))
+        self.request_bytes = Histogram(
+            "http_request_size_bytes", "Request body size.", ("route",), SIZE_BUCKETS)
+        self.response_bytes = Histogram(
+            "http_response_size_bytes", "Response body size (streamed bodies excluded).", ("route",), SIZE_BUCKETS)
+
+        self.db_commands = Counter(
+            "mongodb_commands_total", "MongoDB commands by route, command and outcome.",
+            ("route", "command", "outcome"))
+        self.db_seconds = Histogram(
+            "mongodb_command_duration_seconds", "MongoDB command latency by route and command.",
+            ("route", "command"))
+        self.db_documents = Counter(
+            "mongodb_documents_total", "Documents returned or written by MongoDB commands.",
+            ("route", "command"))
+        self.db_depot_seconds = Counter(
+            "mongodb_depot_seconds_total", "MongoDB time spent serving each depot's requests.",
+            ("route", "depot"))
+
+        self._all = [
+            self.requests, self.request_seconds, self.request_bytes, self.response_bytes,
+            self.db_commands, self.db_seconds, self.db_documents, self.db_depot_seconds
+        ]
+        # Extra callables returning exposition lines (e.g. connection pool gauges)
+        self.collectors = []
+
+    # --- Request attribution ---
+    def start_request(self, route, depot):
+        self._current.route = route
+        self._current.depot = depot
+        self._current.started = time.perf_counter()
+
+    def current(self):
+        """(route, depot) of the request on this thread. Kept after the request
+        ends so streamed bodies read from cursors still count against it."""
+        return getattr(self._current, 'route', 'background'), getattr(self._current, 'depot', '')
+
+    def finish_request(self, method, status, request_size, response_size):
+        route, depot = self.current()
+        started = getattr(self._current, 'started', None)
+        self.requests.inc(route, method, str(status), depot)
+        if started is not None:
+            self.request_seconds.observe(time.perf_counter() - started, route, method)
+        if request_size:
+            self.request_bytes.observe(request_size, route)
+        if response_size is not None:
+            self.response_bytes.observe(response_size, route)
+
+    def render(self):
+        lines = []
+        for metric in self._all:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+def _documents_in_reply(command_name, reply):
+    cursor = reply.get('cursor')
+    if isinstance(cursor, dict):
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    if command_name in ('insert', 'update', 'delete'):
+        return reply.get('n', 0)
+    if command_name in ('findAndModify', 'findandmodify'):
+        return 1 if reply.get('value') else 0
+    return 0
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feeds every MongoDB command's outcome, latency and document count into Metrics."""
+
+    # Driver housekeeping, not application queries
+    IGNORED = {"hello", "isMaster", "ismaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "success", _documents_in_reply(event.command_name, event.reply))
+
+    def failed(self, event):
+        self._record(event, "failure", 0)
+
+    def _record(self, event, outcome, documents):
+        if event.command_name in self.IGNORED:
+            return
+        route, depot = self.metrics.current()
+        seconds = event.duration_micros / 1e6
+        self.metrics.db_commands.inc(route, event.command_name, outcome)
+        self.metrics.db_seconds.observe(seconds, route, event.command_name)
+        if documents:
+            self.metrics.db_documents.inc(route, event.command_name, amount=documents)
+        if depot:
+            self.metrics.db_depot_seconds.inc(route, depot, amount=seconds)
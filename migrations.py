@@ -0,0 +1,102 @@
+import os
+import sys
+from pymongo import UpdateOne
+from normalize import bus_key_fields
+from waybill_schema import LEGACY_FIELDS, upgrade_legacy
+
+# One-off data migrations. Each one is idempotent and can be re-run safely.
+# Usage: python migrations.py [name ...]   (no names = run all)
+
+def backfill_station_master_keys(db):
+    """Adds stationMasterId_lower to users that do not have it yet."""
+    result = db.users.update_many(
+        {"stationMasterId": {"$type": "string"}, "stationMasterId_lower": {"$exists": False}},
+        [{"$set": {"stationMasterId_lower": {"$toLower": {"$trim": {"input": "$stationMasterId"}}}}}]
+    )
+    return result.modified_count
+
+def _backfill_bus_keys(collection, source_field, batch_size):
+    updated = 0
+    batch = []
+    cursor = collection.find(
+        {source_field: {"$type": "string"}, "bus_key": {"$exists": False}},
+        {source_field: 1}
+    ).batch_size(batch_size)
+    for doc in cursor:
+        batch.append(UpdateOne({"_id": doc['_id']}, {"$set": bus_key_fields(doc[source_field])}))
+        if len(batch) >= batch_size:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+def backfill_bus_keys(db, batch_size=1000):
+    """Adds bus_key/bus_key_rev to waybills and buses written before they existed."""
+    return (_backfill_bus_keys(db.waybills, "busRegNo", batch_size)
+            + _backfill_bus_keys(db.buses, "bus_reg_no", batch_size))
+
+def migrate_waybill_schema(db, batch_size=1000):
+    """
+    Converts waybills written before waybill_schema.py: "HH:MM" strings
+    become scheduled_min/actual_min/delay_minutes and crew names/phones move
+    to the crew collection (existing crew rows are not overwritten). Walks
+    the collection in _id order, one bulk write per batch.
+    """
+    legacy = {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]
+              + [{"platformNumber": {"$type": "string"}}]}
+    updated = 0
+    last_id = None
+    while True:
+        query = dict(legacy, _id={"$gt": last_id}) if last_id is not None else legacy
+        docs = list(db.waybills.find(query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]['_id']
+
+        waybill_ops = []
+        crew_ops = {}
+        for doc in docs:
+            updates, unset, crew = upgrade_legacy(doc)
+            for row in crew:
+                crew_ops[row['crew_id']] = UpdateOne({"crew_id": row['crew_id']}, {"$setOnInsert": row}, upsert=True)
+            change = {}
+            if updates:
+                change["$set"] = updates
+            if unset:
+                change["$unset"] = unset
+            if change:
+                waybill_ops.append(UpdateOne({"_id": doc['_id']}, change))
+
+        # Crew first, so a name is never dropped before it is stored elsewhere
+        if crew_ops:
+            db.crew.bulk_write(list(crew_ops.values()), ordered=False)
+        if waybill_ops:
+            updated += db.waybills.bulk_write(waybill_ops, ordered=False).modified_count
+    return updated
+
+MIGRATIONS = {
+    "users_lower": backfill_station_master_keys,
+    "bus_keys": backfill_bus_keys,
+    "waybill_schema": migrate_waybill_schema,
+}
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    MONGO_URI = os.getenv("MONGO_URI")
+    if not MONGO_URI:
+        print("Error: MONGO_URI not found in .env file.")
+        exit(1)
+
+    db = MongoClient(MONGO_URI).get_database()
+
+    names = sys.argv[1:] or list(MIGRATIONS)
+    for name in names:
+        if name not in MIGRATIONS:
+            print(f"Unknown migration: {name}. Available: {', '.join(MIGRATIONS)}")
+            exit(1)
+        print(f"--- Running {name} ---")
+        print(f"{name}: {MIGRATIONS[name](db)} documents updated")
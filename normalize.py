@@ -0,0 +1,36 @@
+# Normalized keys stored next to user-entered identifiers, and the queries
+# that match them. Shared by the routes, the importer, the seed scripts and
+# the migrations that backfill these fields.
+
+def normalize_station_master_id(station_master_id):
+    """Key used for the case-insensitive login lookup."""
+    return (station_master_id or '').strip().lower()
+
+def normalize_bus_key(bus_reg_no):
+    """Search key for a bus number: uppercased, separators stripped ("kl-15-a 1102" -> "KL15A1102")."""
+    return ''.join(ch for ch in (bus_reg_no or '').upper() if ch.isascii() and ch.isalnum())
+
+def bus_key_fields(bus_reg_no):
+    """
+    bus_key supports prefix lookups ("KL15A..."); bus_key_rev is the same key
+    reversed, so a suffix such as the last four digits is also an indexed prefix.
+    """
+    key = normalize_bus_key(bus_reg_no)
+    return {"bus_key": key, "bus_key_rev": key[::-1]}
+
+def bus_key_query(text):
+    """
+    Indexed match on the start or end of a bus number. Returns None when the
+    text has no letters or digits to search on.
+    """
+    key = normalize_bus_key(text)
+    if not key:
+        return None
+    return {"$or": [
+        {"bus_key": _prefix_range(key)},
+        {"bus_key_rev": _prefix_range(key[::-1])}
+    ]}
+
+def _prefix_range(prefix):
+    # Keys are [A-Z0-9] only, so bumping the last character bounds the prefix
+    return {"$gte": prefix, "$lt": prefix[:-1] + chr(ord(prefix[-1]) + 1)}
@@ -0,0 +1,98 @@
+# Aggregation pipelines used by the read endpoints in app.py.
+# They keep per-row status logic and summary counts on the server, so only
+# projected fields and totals cross the wire.
+
+def _text(field, default=''):
+    """Field as a string, or default when missing/null."""
+    return {"$toString": {"$ifNull": [f"${field}", default]}}
+
+def _is_set(field):
+    """True when the field is present and not an empty string (Python truthiness for these strings)."""
+    return {"$ne": [{"$ifNull": [f"${field}", ""]}, ""]}
+
+def _is_unset(field):
+    return {"$eq": [{"$ifNull": [f"${field}", ""]}, ""]}
+
+def _two_digits(expr):
+    return {"$cond": [{"$lt": [expr, 10]}, {"$concat": ["0", {"$toString": expr}]}, {"$toString": expr}]}
+
+def _hhmm(minutes_field, legacy_field, default=''):
+    """"HH:MM" from a minutes-of-day field, falling back to the string on documents not migrated yet."""
+    minutes = f"${minutes_field}"
+    return {"$cond": [
+        {"$isNumber": minutes},
+        {"$concat": [
+            _two_digits({"$toInt": {"$floor": {"$divide": [minutes, 60]}}}),
+            ":",
+            _two_digits({"$toInt": {"$mod": [minutes, 60]}})
+        ]},
+        _text(legacy_field, default)
+    ]}
+
+def _legacy_on_time():
+    """Documents not migrated yet: actual <= scheduled ("HH:MM" compares as text)."""
+    return {"$and": [
+        _is_set("actualTime"),
+        _is_set("scheduledTime"),
+        {"$lte": ["$actualTime", "$scheduledTime"]}
+    ]}
+
+def _on_time():
+    """Arrived/left no later than scheduled (delay_minutes <= 0); waybill_schema.is_on_time in Python."""
+    return {"$cond": [
+        {"$isNumber": "$delay_minutes"},
+        {"$lte": ["$delay_minutes", 0]},
+        _legacy_on_time()
+    ]}
+
+def depot_day_stats_pipeline(depot_id, start, end):
+    """One summary row: total waybills, on-time count and the unique buses seen."""
+    return [
+        {"$match": {"depot_id": depot_id, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "on_time": {"$sum": {"$cond": [_on_time(), 1, 0]}},
+            "buses": {"$addToSet": {"$ifNull": ["$busRegNo", None]}},
+            "platforms": {"$addToSet": "$platformNumber"}
+        }}
+    ]
+
+def master_log_pipeline(depot_id, start, end):
+    """Today's master log rows with status computed server-side, ordered by scheduled time."""
+    status = {"$switch": {
+        "branches": [
+            {"case": {"$and": [_is_unset("actual_min"), _is_unset("actualTime")]}, "then": "Scheduled"},
+            {"case": {"$cond": [
+                {"$isNumber": "$delay_minutes"},
+                {"$gt": ["$delay_minutes", 0]},
+                {"$gt": ["$actualTime", "$scheduledTime"]} # Not migrated yet
+            ]}, "then": "Delayed"}
+        ],
+        "default": "On Time"
+    }}
+    return [
+        {"$match": {"depot_id": depot_id, "timestamp": {"$gte": start, "$lte": end}}},
+        # Legacy documents (scheduledTime only) sort first until migrations.py has run
+        {"$sort": {"scheduled_min": 1, "scheduledTime": 1}},
+        {"$project": {
+            "_id": 0,
+            "busRegNo": _text("busRegNo"),
+            "serviceCategory": _text("serviceCategory"),
+            "route": {"$concat": [_text("origin"), " - ", _text("destination")]},
+            "scheduledTime": _hhmm("scheduled_min", "scheduledTime"),
+            "actualTime": _hhmm("actual_min", "actualTime", "-"),
+            "movementType": _text("movementType"),
+            "status": status,
+            "alerts": {"$concat": ["PF-", _text("platformNumber", "-")]}
+        }},
+        {"$addFields": {
+            "statusClass": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$status", "Delayed"]}, "then": "bg-danger"},
+                    {"case": {"$eq": ["$status", "Scheduled"]}, "then": "bg-info"}
+                ],
+                "default": "bg-success"
+            }}
+        }}
+    ]
@@ -0,0 +1,203 @@
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from waybill_schema import is_on_time, stored_delay
+
+# Daily per-depot rollups of waybills, stored in depot_daily_stats so reports
+# never scan raw waybills.
+#
+# One document per depot per day (_id "<depot_id>:<YYYY-MM-DD>"). A job
+# recomputes every depot/day that received waybills since its watermark,
+# replacing the whole document, so re-running it is harmless. The watermark
+# lives in job_state and only moves forward after a pass completes, so an
+# interrupted run simply resumes from the last completed pass.
+#
+# Usage: python rollups.py [--rebuild-from YYYY-MM-DD]
+
+JOB_ID = "depot_daily_stats"
+# Re-read this far behind the watermark to catch waybills committed late
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# How many days back a bus counts as part of a depot's fleet
+FLEET_WINDOW_DAYS = 30
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _bucket_summary(rows):
+    total = len(rows)
+    on_time = sum(1 for r in rows if r['on_time'])
+    return {
+        "total": total,
+        "on_time": on_time,
+        "on_time_pct": round(on_time / total * 100, 1) if total else 0
+    }
+
+def compute_depot_day(db, depot_id, day):
+    """Builds the depot_daily_stats document for one depot and day."""
+    start = datetime(day.year, day.month, day.day)
+    end = start + timedelta(days=1)
+
+    rows = []
+    buses = set()
+    platforms = set()
+    for wb in db.waybills.find(
+        {"depot_id": depot_id, "timestamp": {"$gte": start, "$lt": end}},
+        {"_id": 0, "busRegNo": 1, "origin": 1, "destination": 1, "serviceCategory": 1,
+         "delay_minutes": 1, "scheduledTime": 1, "actualTime": 1, "platformNumber": 1}
+    ):
+        delay = stored_delay(wb)
+        rows.append({
+            "route": f"{wb.get('origin', '')} - {wb.get('destination', '')}",
+            "service_category": wb.get('serviceCategory') or '',
+            # Same rule as the live dashboard: actual not later than scheduled
+            "on_time": is_on_time(wb),
+            "delay": delay
+        })
+        if wb.get('busRegNo'):
+            buses.add(wb['busRegNo'])
+        if wb.get('platformNumber') not in (None, ''):
+            platforms.add(str(wb['platformNumber']))
+
+    delays = sorted(max(0, r['delay']) for r in rows if r['delay'] is not None)
+
+    by_route = {}
+    by_category = {}
+    for r in rows:
+        by_route.setdefault(r['route'], []).append(r)
+        by_category.setdefault(r['service_category'], []).append(r)
+
+    # Fleet: buses this depot logged over the trailing window, from earlier rollups
+    fleet = set(buses)
+    for previous in db.depot_daily_stats.find(
+        {"depot_id": depot_id, "date": {"$gte": start - timedelta(days=FLEET_WINDOW_DAYS), "$lt": start}},
+        {"_id": 0, "buses": 1}
+    ):
+        fleet.update(previous.get('buses', []))
+
+    user = db.users.find_one({"depotId": depot_id, "platform_count": {"$exists": True}}, {"_id": 0, "platform_count": 1})
+    platform_count = int(user['platform_count']) if user else 0
+
+    return {
+        "_id": f"{depot_id}:{start:%Y-%m-%d}",
+        "depot_id": depot_id,
+        "date": start,
+        **_bucket_summary(rows),
+        "delay_minutes": {
+            "p50": _percentile(delays, 50),
+            "p90": _percentile(delays, 90),
+            "p95": _percentile(delays, 95),
+            "max": delays[-1] if delays else None
+        },
+        "by_route": [dict(route=k, **_bucket_summary(v)) for k, v in sorted(by_route.items())],
+        "by_service_category": [dict(service_category=k, **_bucket_summary(v)) for k, v in sorted(by_category.items())],
+        "buses": sorted(buses),
+        "active_fleet": len(buses),
+        "fleet_size": len(fleet),
+        "fleet_utilization": round(len(buses) / len(fleet) * 100, 1) if fleet else 0,
+        "platforms_used": len(platforms),
+        "platform_count": platform_count,
+        "platform_utilization": round(len(platforms) / platform_count * 100, 1) if platform_count else 0,
+        "updated_at": datetime.now()
+    }
+
+def _changed_depot_days(db, since):
+    """Distinct (depot_id, day) pairs with waybills logged after since."""
+    match = {"depot_id": {"$type": "string"}}
+    if since:
+        match["timestamp"] = {"$gt": since}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "depot_id": "$depot_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+            },
+            "latest": {"$max": "$timestamp"}
+        }},
+        {"$sort": {"_id.day": 1}}
+    ]
+    for row in db.waybills.aggregate(pipeline, allowDiskUse=True):
+        yield row['_id']['depot_id'], datetime.strptime(row['_id']['day'], "%Y-%m-%d"), row['latest']
+
+def acquire_lease(db, owner, seconds):
+    """Lets one worker run the job at a time; returns True if owner holds the lease."""
+    now = datetime.now()
+    try:
+        state = db.job_state.find_one_and_update(
+            {"_id": JOB_ID, "$or": [{"lease_until": {"$lt": now}}, {"lease_owner": owner}, {"lease_until": {"$exists": False}}]},
+            {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception:
+        # Upsert raced another worker holding the lease (duplicate _id)
+        return False
+    return state is not None and state.get('lease_owner') == owner
+
+def run_rollups(db, rebuild_from=None):
+    """
+    Recomputes every depot/day with waybills since the stored watermark
+    (or since rebuild_from). Returns the number of depot/days written.
+    """
+    state = db.job_state.find_one({"_id": JOB_ID}) or {}
+    watermark = state.get('watermark')
+    since = rebuild_from if rebuild_from else (watermark - WATERMARK_OVERLAP if watermark else None)
+
+    written = 0
+    newest = watermark
+    for depot_id, day, latest in _changed_depot_days(db, since):
+        doc = compute_depot_day(db, depot_id, day)
+        db.depot_daily_stats.replace_one({"_id": doc['_id']}, doc, upsert=True)
+        written += 1
+        if newest is None or latest > newest:
+            newest = latest
+
+    if newest is not None and newest != watermark:
+        db.job_state.update_one({"_id": JOB_ID}, {"$set": {"watermark": newest, "last_run": datetime.now()}}, upsert=True)
+    return written
+
+def start_rollup_worker(db, interval):
+    """Runs run_rollups every interval seconds in a daemon thread (one lease holder at a time)."""
+    owner = f"{os.uname().nodename}:{os.getpid()}"
+
+    def loop():
+        while True:
+            try:
+                if acquire_lease(db, owner, interval * 2):
+                    written = run_rollups(db)
+                    if written:
+                        print(f"DEBUG: Rollups updated {written} depot/day(s)")
+            except Exception as e:
+                print(f"ERROR: Rollup job failed: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="rollups", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    MONGO_URI = os.getenv("MONGO_URI")
+    if not MONGO_URI:
+        print("Error: MONGO_URI not found in .env file.")
+        exit(1)
+
+    db = MongoClient(MONGO_URI).get_database()
+
+    rebuild_from = None
+    if len(sys.argv) > 2 and sys.argv[1] == '--rebuild-from':
+        rebuild_from = datetime.strptime(sys.argv[2], "%Y-%m-%d")
+
+    print("--- Updating depot_daily_stats ---")
+    print(f"{run_rollups(db, rebuild_from)} depot/day(s) written")
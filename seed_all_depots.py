@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from normalize import normalize_station_master_id
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
@@ -131,6 +132,7 @@ for depot in depots:
         "depotId": depot_id,
         "name": f"Station Master - {depot['name']}",
         "stationMasterId": sm_id,
+        "stationMasterId_lower": normalize_station_master_id(sm_id), # Indexed login key
         "password": password,
         "platform_count": 20 # User default
     }
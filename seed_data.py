@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from datetime import datetime
+from normalize import bus_key_fields
 
 # Load environment variables
 load_dotenv()
@@ -102,7 +103,7 @@ print("Seeding Buses...")
 for bus in buses:
     db.buses.update_one(
         {"bus_reg_no": bus["bus_reg_no"]},
-        {"$set": bus},
+        {"$set": {**bus, **bus_key_fields(bus["bus_reg_no"])}},
         upsert=True
     )
 print(f"Upserted {len(buses)} buses.")
@@ -0,0 +1,116 @@
+from waybill_schema import format_hhmm
+
+# Declarative waybill views for the read endpoints.
+# Each view lists the fields it returns; the same declaration gives the
+# MongoDB projection (so only those fields are fetched) and the serializer.
+
+class Field:
+    """Copies doc[source] (or default) to out[key]."""
+
+    def __init__(self, key, source=None, default=''):
+        self.key = key
+        self.source = source or key
+        self.default = default
+
+class Computed:
+    """Sets out[key] = fn(doc), reading only the listed source fields."""
+
+    def __init__(self, key, sources, fn):
+        self.key = key
+        self.sources = sources
+        self.fn = fn
+
+class WaybillView:
+    def __init__(self, *fields):
+        # (key, source, default, fn) per output field, in output order
+        self.entries = tuple(
+            (f.key, None, None, f.fn) if isinstance(f, Computed) else (f.key, f.source, f.default, None)
+            for f in fields
+        )
+        sources = []
+        for f in fields:
+            sources.extend(f.sources if isinstance(f, Computed) else [f.source])
+        self.projection = {source: 1 for source in sources}
+        if '_id' not in self.projection:
+            self.projection['_id'] = 0
+
+    def serialize(self, doc):
+        get = doc.get
+        return {key: fn(doc) if fn else get(source, default) for key, source, default, fn in self.entries}
+
+    def serialize_many(self, docs):
+        serialize = self.serialize
+        return [serialize(doc) for doc in docs]
+
+def _isoformat(doc):
+    ts = doc.get('timestamp')
+    return ts.isoformat() if ts else ''
+
+def _display_timestamp(doc):
+    ts = doc.get('timestamp')
+    return ts.strftime("%Y-%m-%d %H:%M") if ts else ''
+
+def _hhmm(minutes_field, legacy_field):
+    """"HH:MM" from a minutes-of-day field, or the string a legacy document still holds."""
+    def fn(doc):
+        minutes = doc.get(minutes_field)
+        if minutes is not None:
+            return format_hhmm(minutes)
+        return doc.get(legacy_field, '')
+    return fn
+
+_scheduled_time = _hhmm('scheduled_min', 'scheduledTime')
+_actual_time = _hhmm('actual_min', 'actualTime')
+
+def _time_if(movement_type):
+    def fn(doc):
+        return _actual_time(doc) if doc.get('movementType') == movement_type else '-'
+    return fn
+
+_ROW_FIELDS = (
+    Field("busRegNo"),
+    Field("serviceCategory"),
+    Field("origin"),
+    Field("destination"),
+    Computed("scheduledTime", ["scheduled_min", "scheduledTime"], _scheduled_time),
+    Computed("actualTime", ["actual_min", "actualTime"], _actual_time),
+    Field("movementType"),
+    Field("depot_id"),
+    # Drives the Delayed/On Time badge (see waybill_schema.is_on_time)
+    Field("delay_minutes", default=None),
+)
+
+# index.html's server-rendered tracker rows
+HOME_VIEW = WaybillView(*_ROW_FIELDS)
+
+# /api/live-data and /api/live-stream
+LIVE_VIEW = WaybillView(
+    Computed("id", ["_id"], lambda doc: str(doc['_id'])),
+    *_ROW_FIELDS,
+    Field("platformNumber"),
+    Computed("timestamp", ["timestamp"], _isoformat),
+)
+
+# /api/bus-history
+HISTORY_VIEW = WaybillView(
+    *_ROW_FIELDS,
+    Field("platformNumber"),
+)
+
+# /api/search
+SEARCH_VIEW = WaybillView(
+    *_ROW_FIELDS,
+    Computed("timestamp", ["timestamp"], _display_timestamp),
+    # Crew Details (names/phones filled in from the crew collection by app._attach_crew)
+    Field("conductorName", default='-'),
+    Field("conductorId", default='-'),
+    Field("driverName", default='-'),
+    Field("driverId", default='-'),
+    # Explicit Arrival/Departure for clarity in search
+    Computed("arrival_time", ["actual_min", "actualTime", "movementType"], _time_if('Arrival')),
+    Computed("departure_time", ["actual_min", "actualTime", "movementType"], _time_if('Departure')),
+    Field("conductorPhone"),
+    Field("driverPhone"),
+)
+
+# /api/master-log rows are shaped by the $project stage in pipelines.master_log_pipeline
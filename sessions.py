@@ -0,0 +1,204 @@
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from lru_cache import LRUTTLCache
+
+# Server-side sessions shared by every gunicorn worker.
+#
+# The cookie only carries a signed random session id; the session itself
+# (for a station master: depot_id, depot_name, platforms, ...) lives in a
+# store every worker can read. Signing uses app.secret_key, which must be
+# the same in every worker (SECRET_KEY).
+#
+# Stores implement load(sid) -> (dict, expires_at) or None,
+# save(sid, data, expires_at) and delete(sid).
+
+_serializer = TaggedJSONSerializer()
+
+class MongoSessionStore:
+    """Sessions in a MongoDB collection; a TTL index on expires_at cleans up (see indexes.py)."""
+
+    def __init__(self, get_collection):
+        self.get_collection = get_collection
+
+    def load(self, sid):
+        doc = self.get_collection().find_one({"_id": sid, "expires_at": {"$gt": datetime.now()}})
+        return (_serializer.loads(doc['data']), doc['expires_at']) if doc else None
+
+    def save(self, sid, data, expires_at):
+        self.get_collection().replace_one(
+            {"_id": sid},
+            {"_id": sid, "data": _serializer.dumps(data), "expires_at": expires_at},
+            upsert=True
+        )
+
+    def delete(self, sid):
+        self.get_collection().delete_one({"_id": sid})
+
+class FileSessionStore:
+    """One file per session in a directory shared by the workers (single host, tests)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid):
+        try:
+            with open(self._path(sid), encoding='utf-8') as f:
+                expires_at, raw = f.read().split('\n', 1)
+        except (OSError, ValueError):
+            return None
+        if float(expires_at) < time.time():
+            self.delete(sid)
+            return None
+        return _serializer.loads(raw), datetime.fromtimestamp(float(expires_at))
+
+    def save(self, sid, data, expires_at):
+        # Write then rename so a concurrent reader never sees half a file
+        tmp = f"{self._path(sid)}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(f"{expires_at.timestamp()}\n{_serializer.dumps(data)}")
+        os.replace(tmp, self._path(sid))
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+class MemorySessionStore:
+    """Process-local; only for a single worker or tests."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+        if not entry or entry[0] < datetime.now():
+            return None
+        return _serializer.loads(entry[1]), entry[0]
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._data[sid] = (expires_at, _serializer.dumps(data))
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Moves the session to a fresh id (call on login to prevent session fixation)."""
+        if self.sid and not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Flask session interface over one of the stores above.
+
+    A session expires lifetime after it was last written. A request made
+    once more than half the lifetime has passed writes it again with a new
+    expiry, so a user who keeps working is not logged out mid-shift, at the
+    cost of one store write per session per half lifetime. Requests under
+    skip_paths (static files, metrics, probes) never touch the store: they
+    get an empty session that is not saved. With cache_ttl set, loaded sessions are kept in a
+    small per-process cache for that many seconds, saving a round trip to
+    the store per request. Saving or deleting a session updates this
+    worker's cache immediately, but other workers keep serving their cached
+    copy for up to cache_ttl, so a logout only reaches them after that. The
+    default (0) reads the store on every request.
+    """
+
+    def __init__(self, store, lifetime=timedelta(hours=12), cache_ttl=0, cache_size=2048, skip_paths=()):
+        self.store = store
+        self.lifetime = lifetime
+        self.skip_paths = tuple(skip_paths)
+        self.cache = LRUTTLCache(maxsize=cache_size, ttl=cache_ttl, negative_ttl=0) if cache_ttl else None
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie or not app.secret_key or request.path.startswith(self.skip_paths):
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+        try:
+            sid = self._signer(app).unsign(cookie).decode('ascii')
+        except BadSignature:
+            return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+        loaded = self.cache.get(sid) if self.cache else None
+        if loaded is None:
+            loaded = self.store.load(sid)
+            if loaded is None:
+                return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+            if self.cache:
+                self.cache.set(sid, loaded)
+        data, expires_at = loaded
+        return ServerSession(dict(data), sid=sid, expires_at=expires_at)
+
+    def _forget(self, sid):
+        self.store.delete(sid)
+        if self.cache:
+            self.cache.invalidate(sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self._forget(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            # Emptied (logout): drop it from the store and the browser
+            if session.modified and not session.new:
+                self._forget(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.now()
+        stale = session.expires_at is not None and session.expires_at - now < self.lifetime / 2
+        if not session.modified and not stale:
+            return
+
+        data = dict(session)
+        session.expires_at = now + self.lifetime
+        self.store.save(session.sid, data, session.expires_at)
+        if self.cache:
+            self.cache.set(session.sid, (data, session.expires_at))
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add('Cookie')
@@ -148,6 +148,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 const busNo = this.value.trim().toUpperCase();
                 if (!busNo) {
                     isGlobalSearchActive = false;
+                    liveCursor = null; // Table shows search results, so reload in full
                     updateDashboard();
                     return;
                 }
@@ -155,18 +156,63 @@ document.addEventListener('DOMContentLoaded', () => {
                 console.log(`DEBUG: Global search for bus: ${busNo}`);
                 isGlobalSearchActive = true;
 
-                try {
-                    const response = await fetch(`/api/bus-history/${busNo}`);
-                    const data = await response.json();
+                await loadBusHistoryPage(busNo, null);
+            }
+        });
 
-                    if (data.status === 'success') {
-                        renderWaybillTable(data.waybills, true);
-                    }
-                } catch (error) {
-                    console.error('DEBUG: Global search error:', error);
+        // Bus history is paged: a sentinel row under the table loads the next page when scrolled into view
+        let historyBusNo = null;
+        let historyNext = null;
+        let historyLoading = false;
+        const historyObserver = window.IntersectionObserver ? new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting) && historyNext && isGlobalSearchActive) {
+                loadBusHistoryPage(historyBusNo, historyNext);
+            }
+        }) : null;
+
+        async function loadBusHistoryPage(busNo, before) {
+            if (historyLoading) return;
+            historyLoading = true;
+            try {
+                const params = new URLSearchParams();
+                if (before) params.set('before', before);
+                const response = await fetch(`/api/bus-history/${encodeURIComponent(busNo)}?${params.toString()}`);
+                const data = await response.json();
+
+                if (data.status === 'success' && isGlobalSearchActive) {
+                    historyBusNo = busNo;
+                    historyNext = data.next;
+                    renderWaybillTable(data.waybills, true, Boolean(before));
+                    observeHistorySentinel();
                 }
+            } catch (error) {
+                console.error('DEBUG: Global search error:', error);
+            } finally {
+                historyLoading = false;
             }
-        });
+        }
+
+        function observeHistorySentinel() {
+            const tableBody = document.querySelector('#liveTrackerTable tbody');
+            if (!tableBody) return;
+            const old = document.getElementById('historySentinel');
+            if (old) {
+                if (historyObserver) historyObserver.unobserve(old);
+                old.remove();
+            }
+            if (!historyNext) return;
+
+            const tr = document.createElement('tr');
+            tr.id = 'historySentinel';
+            tr.innerHTML = '<td colspan="10" class="text-center py-3 text-muted small">Loading more history...</td>';
+            if (!historyObserver) {
+                // No IntersectionObserver: fall back to an explicit button
+                tr.innerHTML = '<td colspan="10" class="text-center py-3"><button class="btn btn-sm btn-outline-secondary">Load more</button></td>';
+                tr.querySelector('button').addEventListener('click', () => loadBusHistoryPage(historyBusNo, historyNext));
+            }
+            tableBody.appendChild(tr);
+            if (historyObserver) historyObserver.observe(tr);
+        }
 
         // Local filtering for quick interaction
         liveTrackerSearchInput.addEventListener('input', function () {
@@ -187,9 +233,31 @@ document.addEventListener('DOMContentLoaded', () => {
     updateDashboard();
     updateMasterLog();
 
+    // Server push: each new waybill at this depot triggers a delta fetch.
+    // While the stream is open the 10s poll below stays idle.
+    let liveStreamOpen = false;
+    if (window.EventSource && document.getElementById('liveTrackerTable')) {
+        const liveStream = new EventSource('/api/live-stream');
+        let pushTimer = null;
+        liveStream.onopen = () => {
+            liveStreamOpen = true;
+        };
+        liveStream.onerror = () => {
+            // EventSource reconnects by itself; poll until it does. A 204 (no
+            // streaming on this server) closes it for good and polling carries on.
+            liveStreamOpen = false;
+        };
+        liveStream.addEventListener('waybill', () => {
+            if (isGlobalSearchActive) return;
+            // Coalesce bursts (e.g. a flushed offline queue) into one fetch
+            clearTimeout(pushTimer);
+            pushTimer = setTimeout(updateDashboard, 250);
+        });
+    }
+
     // Auto-refresh logic
     setInterval(() => {
-        if (!isGlobalSearchActive) {
+        if (!isGlobalSearchActive && !liveStreamOpen) {
             console.log('DEBUG: Auto-refreshing dashboard...');
             updateDashboard();
             // updateMasterLog(); // DISABLED per user request (User wants manual refresh only for logs)
@@ -332,49 +400,114 @@ if (waybillForm) {
         };
     }
 
+    // Reference data (places, buses, crew) comes in one bundle from /api/reference-bundle.
+    // The server sends an ETag and no-cache, so the browser revalidates and reuses its copy.
+    // Until it has loaded (or if it fails) lookups fall back to the per-keystroke APIs.
+    let referenceBundle = null;
+
+    async function loadReferenceBundle() {
+        try {
+            const res = await fetch('/api/reference-bundle');
+            if (!res.ok) return;
+            const data = await res.json();
+            referenceBundle = {
+                places: data.places.map(([name, code]) => ({ name, code })),
+                buses: data.buses.map(([bus_reg_no, service_category]) => ({ bus_reg_no, service_category })),
+                crew: data.crew
+            };
+        } catch (err) {
+            console.error('Reference bundle error:', err);
+        }
+    }
+
+    loadReferenceBundle();
+
+    // Same ranking as the server: exact code, then prefix, then substring
+    function rankSuggestions(items, query, normalize, termsOf, codeOf, limit = 10) {
+        const q = normalize(query);
+        if (!q) return [];
+        const exact = [], prefix = [], substring = [];
+        items.forEach(item => {
+            const terms = termsOf(item);
+            if (codeOf(item) === q) exact.push(item);
+            else if (terms.some(t => t.startsWith(q))) prefix.push(item);
+            else if (terms.some(t => t.includes(q))) substring.push(item);
+        });
+        const byFirstTerm = (a, b) => termsOf(a)[0].localeCompare(termsOf(b)[0]);
+        return exact.concat(prefix.sort(byFirstTerm), substring.sort(byFirstTerm)).slice(0, limit);
+    }
+
+    const normalizeBusKey = s => s.toUpperCase().replace(/[^A-Z0-9]/g, '');
+    const normalizePlace = s => s.trim().toLowerCase();
+
+    function localBusSuggestions(query) {
+        if (!referenceBundle) return null;
+        return rankSuggestions(referenceBundle.buses, query, normalizeBusKey,
+            b => [normalizeBusKey(b.bus_reg_no)], b => normalizeBusKey(b.bus_reg_no));
+    }
+
+    function localPlaceSuggestions(query) {
+        if (!referenceBundle) return null;
+        return rankSuggestions(referenceBundle.places, query, normalizePlace,
+            p => [p.name.toLowerCase(), (p.code || '').toLowerCase()].filter(Boolean),
+            p => (p.code || '').toLowerCase());
+    }
+
     // Custom Autocomplete Helper
-    function setupAutocomplete(inputId, listId, url, displayKey, onSelect) {
+    function setupAutocomplete(inputId, listId, url, displayKey, onSelect, localSearch) {
         const input = document.getElementById(inputId);
         const list = document.getElementById(listId);
 
         if (!input || !list) return;
 
-        input.addEventListener('input', debounce(async (e) => {
-            const query = e.target.value;
-            if (query.length < 1) {
+        function renderSuggestions(results) {
+            list.innerHTML = '';
+
+            if (results.length > 0) {
+                list.classList.remove('d-none');
+                results.forEach(item => {
+                    const li = document.createElement('li');
+                    li.className = 'list-group-item list-group-item-action cursor-pointer';
+                    li.textContent = item[displayKey]; // Dynamic key based on API
+                    li.style.cursor = 'pointer';
+
+                    li.addEventListener('click', () => {
+                        input.value = item[displayKey];
+                        list.classList.add('d-none');
+                        if (onSelect) onSelect(item);
+                    });
+
+                    list.appendChild(li);
+                });
+            } else {
                 list.classList.add('d-none');
-                return;
             }
+        }
 
+        const fetchSuggestions = debounce(async (query) => {
             try {
                 const res = await fetch(`${url}?q=${encodeURIComponent(query)}`);
-                const results = await res.json();
-
-                list.innerHTML = '';
-
-                if (results.length > 0) {
-                    list.classList.remove('d-none');
-                    results.forEach(item => {
-                        const li = document.createElement('li');
-                        li.className = 'list-group-item list-group-item-action cursor-pointer';
-                        li.textContent = item[displayKey]; // Dynamic key based on API
-                        li.style.cursor = 'pointer';
-
-                        li.addEventListener('click', () => {
-                            input.value = item[displayKey];
-                            list.classList.add('d-none');
-                            if (onSelect) onSelect(item);
-                        });
-
-                        list.appendChild(li);
-                    });
-                } else {
-                    list.classList.add('d-none');
-                }
+                renderSuggestions(await res.json());
             } catch (err) {
                 console.error('Autocomplete error:', err);
             }
-        }, 300));
+        }, 300);
+
+        input.addEventListener('input', (e) => {
+            const query = e.target.value;
+            if (query.length < 1) {
+                list.classList.add('d-none');
+                return;
+            }
+
+            // Answer from the reference bundle when it is loaded, no network round trip
+            const local = localSearch ? localSearch(query) : null;
+            if (local) {
+                renderSuggestions(local);
+            } else {
+                fetchSuggestions(query);
+            }
+        });
 
         // Hide on click outside
         document.addEventListener('click', (e) => {
@@ -389,11 +522,11 @@ if (waybillForm) {
         // Optional: Autofill service category if we want
         // const categorySelect = waybillForm.querySelector('select[name="serviceCategory"]');
         // if(categorySelect && item.service_category) categorySelect.value = item.service_category;
-    });
+    }, localBusSuggestions);
 
-    setupAutocomplete('originInput', 'originSuggestions', '/api/search/place', 'name');
-    setupAutocomplete('destInput', 'destSuggestions', '/api/search/place', 'name');
-    setupAutocomplete('viaInput', 'viaSuggestions', '/api/search/place', 'name');
+    setupAutocomplete('originInput', 'originSuggestions', '/api/search/place', 'name', null, localPlaceSuggestions);
+    setupAutocomplete('destInput', 'destSuggestions', '/api/search/place', 'name', null, localPlaceSuggestions);
+    setupAutocomplete('viaInput', 'viaSuggestions', '/api/search/place', 'name', null, localPlaceSuggestions);
 
 
     // Crew Autofill
@@ -407,6 +540,14 @@ if (waybillForm) {
                 const id = idInput.value;
                 if (!id) return;
 
+                // Crew known to this depot are in the bundle already
+                const known = referenceBundle && referenceBundle.crew[id];
+                if (known) {
+                    if (nameInput) nameInput.value = known[0] || '';
+                    if (phoneInput) phoneInput.value = known[1] || '';
+                    return;
+                }
+
                 try {
                     const res = await fetch(`/api/crew/${id}`);
                     const data = await res.json();
@@ -430,6 +571,111 @@ if (waybillForm) {
 
     // --- End Autocomplete Logic ---
 
+    // --- Offline Waybill Queue ---
+    // Entries are queued in localStorage first and flushed to /api/waybill/batch,
+    // so a dropped connection on depot Wi-Fi never loses a logged movement.
+    const WAYBILL_QUEUE_KEY = 'ksrtc_waybill_queue';
+    const WAYBILL_BATCH_SIZE = 50;
+    let isFlushingQueue = false;
+
+    function loadWaybillQueue() {
+        try {
+            return JSON.parse(localStorage.getItem(WAYBILL_QUEUE_KEY)) || [];
+        } catch (e) {
+            return [];
+        }
+    }
+
+    function saveWaybillQueue(queue) {
+        localStorage.setItem(WAYBILL_QUEUE_KEY, JSON.stringify(queue));
+    }
+
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    // Sends queued entries in batches. Returns the number of entries the server
+    // accepted, -1 if the server could not be reached, or -2 if it refused the
+    // request (already reported to the user). Entries only leave the queue once
+    // the server has stored or explicitly rejected them.
+    async function flushWaybillQueue() {
+        if (isFlushingQueue) return 0;
+        isFlushingQueue = true;
+        let sent = 0;
+
+        try {
+            let queue = loadWaybillQueue();
+            while (queue.length > 0) {
+                const batch = queue.slice(0, WAYBILL_BATCH_SIZE);
+                let response;
+                try {
+                    response = await fetch('/api/waybill/batch', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        },
+                        body: JSON.stringify({ waybills: batch })
+                    });
+                } catch (error) {
+                    console.warn('DEBUG: Waybill queue flush failed, will retry:', error);
+                    return -1;
+                }
+
+                if (response.status === 401 || response.status === 403) {
+                    // Session expired: keep the queue for after the next login
+                    alert('Your session has expired. Unsent waybills are kept on this device and will sync after you log in.');
+                    sessionStorage.removeItem('ksrtc_sm_session');
+                    window.location.href = 'login.html';
+                    return -2;
+                }
+                if (!response.ok) {
+                    // 5xx: retry later. Other 4xx refuse the request as a whole (bad
+                    // entries come back in result.rejected), so keep everything too.
+                    if (response.status >= 500) return -1;
+                    const result = await response.json().catch(() => ({}));
+                    alert('Error: ' + (result.message || 'Waybill batch rejected') + '. Waybills are kept on this device.');
+                    return -2;
+                }
+
+                const result = await response.json();
+                (result.rejected || []).forEach(r => {
+                    alert(`Waybill ${r.idempotencyKey || ''} rejected: ${r.message}`);
+                });
+
+                // Everything in the batch was stored, already stored, or rejected
+                const done = new Set(batch.map(wb => wb.idempotencyKey));
+                queue = loadWaybillQueue().filter(wb => !done.has(wb.idempotencyKey));
+                saveWaybillQueue(queue);
+                sent += result.inserted || 0;
+            }
+        } finally {
+            isFlushingQueue = false;
+            updateQueueIndicator();
+        }
+
+        if (sent > 0 && typeof updateDashboard === 'function') {
+            console.log('DEBUG: Triggering immediate update');
+            updateDashboard();
+        }
+        if (sent > 0) loadReferenceBundle(); // Pick up new crew/buses (a 304 if unchanged)
+        return sent;
+    }
+
+    function updateQueueIndicator() {
+        const btn = waybillForm.querySelector('button[type="submit"]');
+        if (!btn) return;
+        const pending = loadWaybillQueue().length;
+        btn.title = pending > 0 ? `${pending} waybill(s) waiting to sync` : '';
+    }
+
+    window.addEventListener('online', flushWaybillQueue);
+    setInterval(() => {
+        if (loadWaybillQueue().length > 0) flushWaybillQueue();
+    }, 15000);
+    updateQueueIndicator();
+    flushWaybillQueue();
+
     waybillForm.addEventListener('submit', async (e) => {
         e.preventDefault();
 
@@ -441,6 +687,7 @@ if (waybillForm) {
 
         const movementType = document.querySelector('input[name="movementType"]:checked')?.value;
         if (movementType) data.movementType = movementType;
+        data.idempotencyKey = newIdempotencyKey();
 
         const btn = waybillForm.querySelector('button[type="submit"]');
         const originalText = btn.innerHTML;
@@ -449,29 +696,24 @@ if (waybillForm) {
             btn.innerHTML = '<span class="spinner-border spinner-border-sm me-2"></span>Logging...';
             btn.disabled = true;
 
-            const response = await fetch('/api/waybill', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(data)
-            });
-
-            const result = await response.json();
-
-            if (response.ok) {
-                alert('Waybill entry logged successfully!');
-                waybillForm.reset();
-                updateActualTime(); // Reset time to now
-
-                // Trigger live update
-                if (typeof updateDashboard === 'function') {
-                    console.log('DEBUG: Triggering immediate update');
-                    updateDashboard();
-                }
+            const queue = loadWaybillQueue();
+            queue.push(data);
+            saveWaybillQueue(queue);
+
+            const sent = await flushWaybillQueue();
+            // 0 can also mean a flush was already running and this entry is still waiting
+            const stillQueued = loadWaybillQueue().some(wb => wb.idempotencyKey === data.idempotencyKey);
+            if (sent === -2) {
+                // Already reported by flushWaybillQueue; the entry stays queued
+            } else if (sent < 0) {
+                alert('Network unavailable. Waybill saved on this device and will sync automatically.');
+            } else if (stillQueued) {
+                alert('Waybill queued. It will be sent with the sync already in progress.');
             } else {
-                alert('Error: ' + result.message);
+                alert('Waybill entry logged successfully!');
             }
+            waybillForm.reset();
+            updateActualTime(); // Reset time to now
         } catch (error) {
             console.error('Error submitting waybill:', error);
             alert('An error occurred while logging the waybill: ' + error.message);
@@ -483,10 +725,25 @@ if (waybillForm) {
 }
 
 // Live Dashboard Update Logic
+// Today's waybills already on screen, newest first, and the server cursor for the next delta
+let liveWaybills = [];
+let liveCursor = null;
+
+// Merges a delta from /api/live-data into liveWaybills (rows in the overlap window repeat)
+function mergeLiveWaybills(delta) {
+    const known = new Set(liveWaybills.map(wb => wb.id));
+    const fresh = delta.filter(wb => !known.has(wb.id));
+    if (fresh.length === 0) return false;
+    liveWaybills = fresh.concat(liveWaybills);
+    liveWaybills.sort((a, b) => (a.timestamp < b.timestamp ? 1 : a.timestamp > b.timestamp ? -1 : 0));
+    return true;
+}
+
 async function updateDashboard() {
     console.log('DEBUG: updateDashboard() started');
     try {
-        const response = await fetch('/api/live-data');
+        const url = liveCursor ? `/api/live-data?since=${encodeURIComponent(liveCursor)}` : '/api/live-data';
+        const response = await fetch(url);
         console.log('DEBUG: /api/live-data response status:', response.status);
 
         if (!response.ok) {
@@ -509,26 +766,37 @@ async function updateDashboard() {
             if (punctualityEl) punctualityEl.textContent = data.stats.punctuality + '%';
             if (utilizationEl) utilizationEl.textContent = data.stats.utilization + '%';
 
-            // Update Platforms
-            updatePlatforms(data.waybills);
+            // Full reload on first load or when the cursor was rejected, otherwise merge the delta
+            let changed = true;
+            if (data.full) {
+                liveWaybills = data.waybills;
+            } else {
+                changed = mergeLiveWaybills(data.waybills);
+            }
+            liveCursor = data.cursor;
+
+            if (changed || data.full) {
+                // Update Platforms
+                updatePlatforms(liveWaybills);
 
-            // Update Table
-            renderWaybillTable(data.waybills);
+                // Update Table
+                renderWaybillTable(liveWaybills);
+            }
         }
     } catch (error) {
         console.error('DEBUG: Error updating dashboard:', error);
     }
 }
 
-function renderWaybillTable(waybills, isGlobal = false) {
+function renderWaybillTable(waybills, isGlobal = false, append = false) {
     const tableBody = document.querySelector('#liveTrackerTable tbody');
     const sessionData = sessionStorage.getItem('ksrtc_sm_session');
     if (!tableBody || !sessionData) return;
 
     const session = JSON.parse(sessionData);
-    tableBody.innerHTML = '';
+    if (!append) tableBody.innerHTML = '';
 
-    if (waybills.length === 0) {
+    if (waybills.length === 0 && !append) {
         tableBody.innerHTML = `<tr><td colspan="10" class="text-center py-4 text-muted">${isGlobal ? 'No history found for this bus.' : 'No live data available for this depot yet.'}</td></tr>`;
         return;
     }
@@ -549,7 +817,11 @@ function renderWaybillTable(waybills, isGlobal = false) {
             badgeClass = 'bg-warning-subtle text-warning';
         }
 
-        let isDelayed = wb.actualTime > wb.scheduledTime;
+        // Same rule as the master log: delay_minutes (which handles trips across
+        // midnight), or the "HH:MM" strings on rows not migrated yet
+        const isDelayed = wb.delay_minutes != null
+            ? wb.delay_minutes > 0
+            : wb.actualTime > wb.scheduledTime;
         const timeClass = isDelayed ? 'text-danger' : 'text-success';
         const deviationText = isDelayed ? 'Delayed' : 'On Time';
         const deviationClass = isDelayed ? 'text-danger fw-bold' : 'text-success fw-bold';
@@ -0,0 +1,118 @@
+import threading
+import time
+from datetime import date
+from waybill_schema import is_on_time
+
+class DepotDayStats:
+    """Running live-data stats for one depot on one day."""
+
+    def __init__(self):
+        self.buses = set()
+        self.platforms = set()
+        self.on_time = 0
+        self.total = 0
+
+    def add(self, wb):
+        self.total += 1
+        self.buses.add(wb.get('busRegNo'))
+        if wb.get('platformNumber') not in (None, ''):
+            self.platforms.add(str(wb['platformNumber']))
+        if is_on_time(wb):
+            self.on_time += 1
+
+    def as_dict(self, platform_count=0):
+        # Punctuality Score
+        punctuality = 0
+        if self.total > 0:
+            punctuality = round((self.on_time / self.total) * 100, 1)
+        # Platform utilization: share of the depot's platforms used today
+        utilization = 0
+        if platform_count:
+            utilization = round(min(len(self.platforms), platform_count) / platform_count * 100, 1)
+        return {
+            # Active Fleet (approximate based on unique buses in list)
+            "active_fleet": len(self.buses),
+            "punctuality": punctuality,
+            "utilization": utilization
+        }
+
+class InMemoryStatsBackend:
+    """
+    Process-local store for StatsCache. Another backend (e.g. a shared store
+    for several gunicorn workers) only needs get/set/delete/keys with the same
+    semantics: values are (expires_at, DepotDayStats).
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, key):
+        return self._data.get(key)
+
+    def set(self, key, value):
+        self._data[key] = value
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def keys(self):
+        return list(self._data)
+
+class StatsCache:
+    """
+    Per-depot, per-day live-data stats.
+
+    Misses are filled by loader(depot_id, day), which scans that day's
+    waybills once; after that record() keeps the entry current on every
+    insert. Entries expire after ttl seconds (so writes made by other
+    workers show up) and entries for past days are dropped at midnight.
+    """
+
+    def __init__(self, loader, backend=None, ttl=60):
+        self.loader = loader
+        self.backend = backend or InMemoryStatsBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._today = date.today()
+
+    def _evict_past_days(self):
+        today = date.today()
+        if today == self._today:
+            return
+        self._today = today
+        for key in self.backend.keys():
+            if key[1] != today:
+                self.backend.delete(key)
+
+    def get(self, depot_id, day, platform_count=0):
+        """Returns the stats dict for a depot/day, loading it on a miss."""
+        key = (depot_id, day)
+        with self._lock:
+            self._evict_past_days()
+            entry = self.backend.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1].as_dict(platform_count)
+
+        stats = self.loader(depot_id, day)
+        with self._lock:
+            self.backend.set(key, (time.monotonic() + self.ttl, stats))
+        return stats.as_dict(platform_count)
+
+    def record(self, waybill):
+        """Write-through: folds a newly inserted waybill into its cached entry."""
+        timestamp = waybill.get('timestamp')
+        if not timestamp or not waybill.get('depot_id'):
+            return
+        key = (waybill['depot_id'], timestamp.date())
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry:
+                entry[1].add(waybill)
+                # Keep in-process backends and copy-on-read backends equivalent
+                self.backend.set(key, entry)
+
+    def invalidate(self, depot_id=None):
+        with self._lock:
+            for key in self.backend.keys():
+                if depot_id is None or key[0] == depot_id:
+                    self.backend.delete(key)
@@ -0,0 +1,67 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+# The app is imported once against a placeholder URI; each test then swaps
+# in a fresh in-memory mongomock client. No MongoDB server is needed.
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:1/rtc_test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["ENSURE_INDEXES"] = "0"
+os.environ["ROLLUP_INTERVAL_SECONDS"] = "0"
+os.environ["SESSION_BACKEND"] = "memory"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock = pytest.importorskip("mongomock")
+from mongomock import collection as _mongomock_collection
+
+# pymongo >= 4.9 passes sort= to bulk updates, which mongomock does not know yet
+_add_update = _mongomock_collection.BulkOperationBuilder.add_update
+def _add_update_without_sort(self, *args, sort=None, **kwargs):
+    return _add_update(self, *args, **kwargs)
+_mongomock_collection.BulkOperationBuilder.add_update = _add_update_without_sort
+
+import app as appmod
+
+@pytest.fixture
+def db(monkeypatch):
+    client = mongomock.MongoClient("mongodb://localhost/rtc_test")
+    monkeypatch.setattr(appmod.mongo, "_client", client)
+    monkeypatch.setattr(appmod.mongo, "_pid", os.getpid())
+    # mongomock has no sessions/transactions
+    monkeypatch.setattr(appmod, "_transactions_supported", False)
+    appmod.live_stats_cache.invalidate()
+    return client.get_database()
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+@pytest.fixture
+def load_worker(db):
+    """Another gunicorn worker: a separate copy of app.py (own module state and caches) on the same database."""
+    def load(name):
+        spec = importlib.util.spec_from_file_location(name, APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.mongo._client = appmod.mongo._client
+        module.mongo._pid = os.getpid()
+        module._transactions_supported = False
+        module.app.testing = True
+        return module
+    return load
+
+@pytest.fixture
+def client(db):
+    appmod.app.testing = True
+    return appmod.app.test_client()
+
+@pytest.fixture
+def admin(client):
+    with client.session_transaction() as s:
+        s['is_admin'] = True
+    return client
+
+@pytest.fixture
+def station_master(client):
+    with client.session_transaction() as s:
+        s['user'] = {"depot_id": "TVM", "station_master_id": "SM_TVM_001", "depot_name": "Thiruvananthapuram", "platforms": [1, 2]}
+    return client
@@ -0,0 +1,21 @@
+from admin_query import SORTABLE_FIELDS
+from indexes import INDEXES
+
+def test_every_sort_field_has_a_keyset_index():
+    declared = {(collection, tuple(name for name, _ in keys)) for collection, keys, _ in INDEXES}
+    for collection, fields in SORTABLE_FIELDS.items():
+        for field in fields:
+            assert (collection, (field, "_id")) in declared, f"{collection}.{field}"
+
+def test_pages_walk_ties_and_missing_values_once(admin, db):
+    db.buses.insert_many([{"bus_reg_no": reg} for reg in ("KL-1", "KL-1", "KL-2", None, "KL-3")])
+    for order in ("asc", "desc"):
+        seen, after = [], None
+        while True:
+            url = f'/api/admin/data/buses?sort=bus_reg_no&order={order}&limit=2'
+            body = admin.get(url + (f'&after={after}' if after else '')).get_json()
+            seen += [item['_id'] for item in body['items']]
+            after = body['next']
+            if not after:
+                break
+        assert sorted(seen) == sorted(str(d['_id']) for d in db.buses.find())
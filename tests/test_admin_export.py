@@ -0,0 +1,33 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+def _seed(db):
+    db.waybills.insert_many([
+        {"busRegNo": "KL-2", "scheduled_min": 600, "actual_min": 610, "delay_minutes": 10,
+         "depot_id": "TVM", "timestamp": datetime(2026, 3, 14, 9, 0)},
+        # Not migrated yet
+        {"busRegNo": "KL-1", "scheduledTime": "09:00", "actualTime": "08:55", "conductorName": "Raj",
+         "depot_id": "TVM", "timestamp": datetime(2026, 3, 14, 8, 0)},
+    ])
+
+def test_csv_export_gives_unmigrated_rows_minute_times(admin, db):
+    _seed(db)
+    r = admin.get('/api/admin/export/waybills?format=csv')
+    rows = list(csv.DictReader(io.StringIO(r.get_data(as_text=True))))
+    assert [row['busRegNo'] for row in rows] == ["KL-1", "KL-2"] # Timestamp order
+    assert [(row['scheduled_min'], row['actual_min'], row['delay_minutes']) for row in rows] == [
+        ("540", "535", "-5"), ("600", "610", "10")]
+
+def test_ndjson_export_with_fields_returns_only_those_fields(admin, db):
+    _seed(db)
+    r = admin.get('/api/admin/export/waybills?format=ndjson&fields=busRegNo,delay_minutes')
+    docs = [json.loads(line) for line in r.get_data(as_text=True).splitlines()]
+    assert [{k: v for k, v in d.items() if k != '_id'} for d in docs] == [
+        {"busRegNo": "KL-1", "delay_minutes": -5}, {"busRegNo": "KL-2", "delay_minutes": 10}]
+
+def test_export_never_includes_passwords(admin, db):
+    db.users.insert_one({"stationMasterId": "SM1", "password": "secret"})
+    for url in ('/api/admin/export/users?format=ndjson', '/api/admin/export/users?format=ndjson&fields=password,stationMasterId'):
+        assert b"secret" not in admin.get(url).get_data()
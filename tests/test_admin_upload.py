@@ -0,0 +1,80 @@
+import io
+import tempfile
+from datetime import datetime
+from importer import create_job, run_import
+
+def _upload(client, collection, body, **params):
+    query = '&'.join(f"{k}={v}" for k, v in params.items())
+    return client.post(
+        f"/api/admin/upload/{collection}?{query}",
+        data={"file": (io.BytesIO(body), "upload.csv")},
+        content_type="multipart/form-data"
+    )
+
+def test_upload_inserts_rows(admin, db):
+    body = "\ufeffcrew_id,name,phone\nC1,Raj,999\nC2,Mo,888\n".encode('utf-8')
+    r = _upload(admin, "crew", body)
+    assert r.status_code == 200, r.get_json()
+    result = r.get_json()
+    assert result['status'] == 'success'
+    assert result['inserted'] == 2
+    # BOM stripped from the first header
+    assert db.crew.find_one({"crew_id": "C1"}, {"_id": 0}) == {"crew_id": "C1", "name": "Raj", "phone": "999"}
+    assert db.import_jobs.find_one({"_id": result['job_id']})['status'] == 'completed'
+
+def test_upload_reports_invalid_rows(admin, db):
+    body = b"busRegNo,platformNumber,scheduledTime\nKL-15-A-1102,3,10:05\n,4,10:00\nKL-01-B-5,x,10:00\n"
+    result = _upload(admin, "waybills", body).get_json()
+    assert result['inserted'] == 1
+    assert result['invalid'] == 2
+    assert [e['row'] for e in result['errors']] == [3, 4]
+    assert db.waybills.find_one({}, {"_id": 0, "platformNumber": 1, "scheduled_min": 1}) == {"platformNumber": 3, "scheduled_min": 605}
+
+def test_upload_multiline_and_non_ascii(admin, db):
+    body = 'name,code\n"Thiruvananthapuram\nCentral",TVM\nതൃശൂർ,TCR\n'.encode('utf-8')
+    result = _upload(admin, "places", body, chunk_size=1).get_json()
+    assert result['inserted'] == 2
+    assert sorted(p['name'] for p in db.places.find()) == ["Thiruvananthapuram\nCentral", "തൃശൂർ"]
+
+def test_upload_upsert(admin, db):
+    db.crew.insert_one({"crew_id": "C1", "name": "Old"})
+    result = _upload(admin, "crew", b"crew_id,name\nC1,New\nC2,Other\n", mode="upsert").get_json()
+    assert (result['updated'], result['upserted']) == (1, 1)
+    assert db.crew.find_one({"crew_id": "C1"})['name'] == "New"
+
+def test_upload_requires_admin(client):
+    assert _upload(client, "crew", b"crew_id\nC1\n").status_code == 401
+
+def test_run_import_reads_spooled_upload(db):
+    # werkzeug hands large uploads over as a SpooledTemporaryFile
+    with tempfile.SpooledTemporaryFile(max_size=16) as f:
+        f.write(b"crew_id,name\n" + b"".join(b"C%d,Crew %d\n" % (i, i) for i in range(50)))
+        f.seek(0)
+        job_id = create_job(db, "crew", "insert", "spooled.csv")
+        result = run_import(db, job_id, "crew", f, chunk_size=20)
+    assert result['status'] == 'completed'
+    assert result['inserted'] == 50
+
+def test_waybill_upload_stores_the_form_shape(admin, db):
+    body = (b"busRegNo,scheduledTime,actualTime,movementType,conductorId,conductorName,depot_id,via\n"
+            b"KL-15-A-1102,23:55,00:10,Departure,C1,Raj,TVM,\n"
+            b"KL-15-A-1103,10:00,10:00,Sideways,,,TVM,\n"
+            b"KL-15-A-1104,10:00,10:00,Arrival,,,TVM,Kollam\n")
+    result = _upload(admin, "waybills", body).get_json()
+    assert result['inserted'] == 1
+    assert [e['row'] for e in result['errors']] == [3, 4] # Bad movementType, unknown column
+    assert db.waybills.find_one({}, {"_id": 0, "timestamp": 0}) == {
+        "busRegNo": "KL-15-A-1102", "movementType": "Departure", "conductorId": "C1", "depot_id": "TVM",
+        "scheduled_min": 1435, "actual_min": 10, "delay_minutes": 15,
+        "bus_key": "KL15A1102", "bus_key_rev": "2011A51LK"}
+    # Crew names are stored as references, not on the waybill
+    assert db.crew.find_one({"crew_id": "C1"}, {"_id": 0}) == {"crew_id": "C1", "name": "Raj", "phone": None, "role": "Conductor"}
+
+def test_waybill_export_imports_back(admin, db):
+    stored = {"busRegNo": "KL-1", "scheduled_min": 600, "actual_min": 610, "delay_minutes": 10,
+              "depot_id": "TVM", "logged_by": "SM1", "timestamp": datetime(2026, 3, 14, 9, 0)}
+    db.waybills.insert_one(dict(stored))
+    exported = admin.get('/api/admin/export/waybills?format=csv').get_data()
+    db.waybills.delete_many({})
+    assert _upload(admin, "waybills", exported).get_json()['inserted'] == 1
+    assert db.waybills.find_one({}, {"_id": 0, "bus_key": 0, "bus_key_rev": 0}) == stored
@@ -0,0 +1,29 @@
+import app as appmod
+
+def _buses(client, q="KL"):
+    return [item['bus_reg_no'] for item in client.get(f'/api/search/bus?q={q}').get_json()]
+
+def test_admin_writes_rebuild_bus_suggestions(station_master, db):
+    db.buses.insert_one({"bus_reg_no": "KL-15-A-1102"})
+    appmod.bus_suggestions.invalidate()
+    assert _buses(station_master) == ["KL-15-A-1102"]
+    with station_master.session_transaction() as s:
+        s['is_admin'] = True
+
+    r = station_master.post('/api/admin/data/buses', json={"bus_reg_no": "KL-15-A-2000"})
+    assert sorted(_buses(station_master)) == ["KL-15-A-1102", "KL-15-A-2000"]
+    station_master.put('/api/admin/data/buses', json={"_id": r.get_json()['id'], "bus_reg_no": "KL-07-B-3000"})
+    assert sorted(_buses(station_master)) == ["KL-07-B-3000", "KL-15-A-1102"]
+    station_master.delete(f"/api/admin/data/buses?id={r.get_json()['id']}")
+    assert _buses(station_master) == ["KL-15-A-1102"]
+
+def test_caches_are_dropped_after_the_write(admin, db, monkeypatch):
+    # A reader refilling the cache right as it is dropped must already see the write
+    invalidate = appmod._invalidate_caches_for
+    def invalidate_then_read(collection_name):
+        invalidate(collection_name)
+        appmod.bus_suggestions.search("KL")
+    monkeypatch.setattr(appmod, "_invalidate_caches_for", invalidate_then_read)
+    appmod.bus_suggestions.invalidate()
+    admin.post('/api/admin/data/buses', json={"bus_reg_no": "KL-15-A-2000"})
+    assert [item['bus_reg_no'] for item in appmod.bus_suggestions.search("KL")] == ["KL-15-A-2000"]
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+import pytest
+
+BUS = "KL-15-A-1102"
+T0 = datetime(2026, 3, 14, 9, 0)
+
+@pytest.fixture
+def history(db):
+    # Three rows share one timestamp, so pages must break ties on _id
+    times = [T0, T0 + timedelta(minutes=5), T0 + timedelta(minutes=5), T0 + timedelta(minutes=5),
+             T0 + timedelta(minutes=9), T0 + timedelta(minutes=12), T0 + timedelta(minutes=20)]
+    db.waybills.insert_many([{"busRegNo": BUS, "platformNumber": i, "timestamp": t} for i, t in enumerate(times)])
+    db.waybills.insert_one({"busRegNo": "KL-01-B-1", "platformNumber": 99, "timestamp": T0})
+    return [doc['platformNumber'] for doc in db.waybills.find({"busRegNo": BUS}).sort([("timestamp", -1), ("_id", -1)])]
+
+def _walk(client, limit):
+    pages, before = [], None
+    while True:
+        url = f"/api/bus-history/{BUS}?limit={limit}" + (f"&before={before}" if before else "")
+        r = client.get(url)
+        assert r.status_code == 200
+        body = r.get_json()
+        pages.append([wb['platformNumber'] for wb in body['waybills']])
+        before = body['next']
+        if not before:
+            return pages
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_pages_cover_every_row_once_in_order(station_master, history, limit):
+    pages = _walk(station_master, limit)
+    assert [n for page in pages for n in page] == history
+    assert all(len(page) == limit for page in pages[:-1])
+
+def test_last_full_page_has_no_next_cursor(station_master, history):
+    body = station_master.get(f"/api/bus-history/{BUS}?limit=7").get_json()
+    assert len(body['waybills']) == 7 and body['next'] is None
+
+@pytest.mark.parametrize("before", ["garbage", "2026-03-14T09:05:00_notanid", "yesterday_65f2a0c1e4b0a1b2c3d4e5f6"])
+def test_malformed_cursor_is_a_400(station_master, history, before):
+    r = station_master.get(f"/api/bus-history/{BUS}?before={before}")
+    assert r.status_code == 400
+    assert r.get_json() == {"status": "error", "message": "Invalid cursor"}
@@ -0,0 +1,29 @@
+import pytest
+
+FORM = {"busRegNo": "KL-15-A-1102", "conductorId": "C1", "conductorName": "Raj"}
+
+@pytest.fixture
+def workers(load_worker, monkeypatch):
+    monkeypatch.setenv("CREW_CACHE_CHECK_SECONDS", "0")
+    clients = []
+    for name in ("crew_worker_a", "crew_worker_b"):
+        client = load_worker(name).app.test_client()
+        with client.session_transaction() as s:
+            s['user'] = {"depot_id": "TVM", "station_master_id": "SM_TVM_001", "platforms": [1, 2]}
+            s['is_admin'] = True
+        clients.append(client)
+    return clients
+
+def test_crew_saved_on_one_worker_replaces_a_cached_miss_on_the_other(workers):
+    a, b = workers
+    assert a.get('/api/crew/C1').status_code == 404 # Cached as missing
+    assert b.post('/api/waybill', json=FORM).status_code == 201
+    assert a.get('/api/crew/C1').get_json()['crew']['name'] == "Raj"
+
+def test_admin_crew_edit_reaches_the_other_worker(workers, db):
+    a, b = workers
+    b.post('/api/waybill', json=FORM)
+    assert a.get('/api/crew/C1').get_json()['crew']['name'] == "Raj" # Cached
+    crew_id = str(db.crew.find_one({"crew_id": "C1"})['_id'])
+    b.put('/api/admin/data/crew', json={"_id": crew_id, "name": "Rajan"})
+    assert a.get('/api/crew/C1').get_json()['crew']['name'] == "Rajan"
@@ -0,0 +1,16 @@
+from indexes import INDEXES, ensure_indexes
+
+def test_ensure_indexes_replaces_retired_indexes(db):
+    db.waybills.create_index([("timestamp", 1)], name="timestamp")
+    db.buses.create_index([("bus_key", 1)], name="bus_key")
+    # Same name, different keys: not ours to drop
+    db.buses.create_index([("bus_key_rev", 1), ("bus_reg_no", 1)], name="bus_key_rev")
+
+    assert ensure_indexes(db) == []
+    assert "timestamp" not in db.waybills.index_information()
+    assert "bus_key" not in db.buses.index_information()
+    assert "bus_key_rev" in db.buses.index_information()
+    for collection, _, options in INDEXES:
+        assert options['name'] in db[collection].index_information()
+
+    assert ensure_indexes(db) == [] # Safe to run again
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from urllib.parse import quote
+import pytest
+
+@pytest.fixture
+def now():
+    now = datetime.now().replace(microsecond=0)
+    if now - timedelta(minutes=15) < datetime(now.year, now.month, now.day):
+        pytest.skip("needs 15 minutes of today behind it")
+    return now
+
+def _waybill(bus, at, depot_id="TVM"):
+    return {"busRegNo": bus, "depot_id": depot_id, "timestamp": at, "delay_minutes": 0}
+
+def _live(client, since=None):
+    r = client.get('/api/live-data' + (f"?since={quote(since)}" if since else ""))
+    assert r.status_code == 200
+    return r.get_json()
+
+def test_full_load_then_deltas(station_master, db, now):
+    db.waybills.insert_many([
+        _waybill("KL-1", now - timedelta(minutes=10)),
+        _waybill("KL-2", now - timedelta(minutes=5)),
+        _waybill("KL-9", now - timedelta(minutes=1), depot_id="EKM"), # Other depot
+        _waybill("KL-8", now - timedelta(days=1)), # Yesterday
+    ])
+    first = _live(station_master)
+    assert first['full'] is True
+    assert [wb['busRegNo'] for wb in first['waybills']] == ["KL-2", "KL-1"]
+    assert first['cursor'] == (now - timedelta(minutes=5)).isoformat()
+
+    # Nothing new: only the overlap window comes back and the cursor stays
+    idle = _live(station_master, first['cursor'])
+    assert idle['full'] is False
+    assert [wb['busRegNo'] for wb in idle['waybills']] == ["KL-2"]
+    assert idle['cursor'] == first['cursor']
+
+    assert station_master.post('/api/waybill', json={"busRegNo": "KL-3"}).status_code == 201
+    delta = _live(station_master, first['cursor'])
+    assert [wb['busRegNo'] for wb in delta['waybills']] == ["KL-3", "KL-2"]
+    assert delta['cursor'] == delta['waybills'][0]['timestamp'] > first['cursor']
+    # Stats still cover the whole day
+    assert delta['stats']['active_fleet'] == 3
+
+@pytest.mark.parametrize("since", ["not-a-time", "yesterday"])
+def test_bad_or_stale_cursor_gets_a_full_reload(station_master, db, now, since):
+    db.waybills.insert_one(_waybill("KL-1", now - timedelta(minutes=10)))
+    if since == "yesterday":
+        since = (now - timedelta(days=1)).isoformat()
+    body = _live(station_master, since)
+    assert body['full'] is True
+    assert [wb['busRegNo'] for wb in body['waybills']] == ["KL-1"]
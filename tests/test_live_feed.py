@@ -0,0 +1,69 @@
+import queue
+import sys
+import types
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from live_feed import LiveFeedHub
+import app as appmod
+
+def _hub(db, **kwargs):
+    return LiveFeedHub(lambda: db.waybills, lambda doc: doc['busRegNo'], projection={"busRegNo": 1, "depot_id": 1},
+                       poll_interval=0.01, **kwargs)
+
+def _drain(q, count):
+    return sorted(q.get(timeout=2) for _ in range(count))
+
+def test_falls_back_to_polling_when_the_change_stream_cannot_open(db):
+    # mongomock has no change streams
+    hub = _hub(db)
+    q = hub.subscribe("TVM")
+    for _ in range(200):
+        if hub.mode == "polling":
+            break
+        hub._thread.join(0.01)
+    assert hub.mode == "polling"
+    db.waybills.insert_one({"busRegNo": "KL-1", "depot_id": "TVM", "timestamp": datetime.now()})
+    assert q.get(timeout=2) == "KL-1"
+
+def test_poll_delivers_rows_with_lower_ids_committed_late(db):
+    hub = _hub(db, poll_overlap=timedelta(seconds=30))
+    now = datetime.now()
+    seen = {}
+    since = hub._poll_once(now, seen, publish=False)
+    q = queue.Queue()
+    hub._subscribers["TVM"] = {q}
+
+    newer, older = ObjectId(), ObjectId()
+    newer, older = max(newer, older), min(newer, older)
+    db.waybills.insert_one({"_id": newer, "busRegNo": "KL-NEW", "depot_id": "TVM", "timestamp": now + timedelta(seconds=2)})
+    since = hub._poll_once(since, seen)
+    # Another worker commits a row with a smaller ObjectId and an earlier timestamp
+    db.waybills.insert_one({"_id": older, "busRegNo": "KL-LATE", "depot_id": "TVM", "timestamp": now + timedelta(seconds=1)})
+    db.waybills.insert_one({"busRegNo": "KL-OTHER", "depot_id": "EKM", "timestamp": now + timedelta(seconds=1)})
+    hub._poll_once(since, seen)
+
+    assert _drain(q, 2) == ["KL-LATE", "KL-NEW"]
+    assert q.empty() # Nothing sent twice
+
+def test_poll_forgets_ids_outside_the_overlap(db):
+    hub = _hub(db, poll_overlap=timedelta(seconds=5))
+    now = datetime.now()
+    seen = {}
+    db.waybills.insert_one({"busRegNo": "KL-1", "depot_id": "TVM", "timestamp": now})
+    since = hub._poll_once(now, seen, publish=False)
+    db.waybills.insert_one({"busRegNo": "KL-2", "depot_id": "TVM", "timestamp": now + timedelta(seconds=60)})
+    hub._poll_once(since, seen, publish=False)
+    assert len(seen) == 1
+
+def test_live_stream_answers_204_without_an_async_worker(station_master):
+    # The test process has not been patched by gevent/eventlet: a sync worker
+    r = station_master.get('/api/live-stream')
+    assert r.status_code == 204
+    assert r.get_data() == b""
+
+def test_live_stream_is_enabled_under_a_patched_worker(monkeypatch):
+    assert not appmod._live_stream_enabled()
+    monkeypatch.setitem(sys.modules, "gevent.monkey", types.SimpleNamespace(is_module_patched=lambda name: name == 'socket'))
+    assert appmod._live_stream_enabled()
+    monkeypatch.setattr(appmod, "LIVE_STREAM_MODE", "off")
+    assert not appmod._live_stream_enabled()
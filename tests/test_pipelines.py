@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+import pytest
+from pipelines import depot_day_stats_pipeline, master_log_pipeline
+from stats_cache import DepotDayStats
+from waybill_schema import format_hhmm, normalize_waybill
+
+# The pipelines replaced Python loops over the raw documents. Each test runs
+# both over the same waybills and expects identical output.
+
+DAY = datetime(2026, 3, 14)
+
+def old_master_log(waybills):
+    """The loop get_master_log ran before master_log_pipeline (a missing
+    actualTime now reads as Scheduled instead of raising TypeError)."""
+    def hhmm(wb, minutes_field, legacy_field, default):
+        if wb.get(minutes_field) is not None:
+            return format_hhmm(wb[minutes_field])
+        return str(wb.get(legacy_field, default))
+
+    def status(wb):
+        if wb.get('actual_min') is None and not wb.get('actualTime'):
+            return "Scheduled", "bg-info"
+        if wb.get('delay_minutes') is not None:
+            late = wb['delay_minutes'] > 0
+        else:
+            late = (wb.get('actualTime') or '') > (wb.get('scheduledTime') or '')
+        return ("Delayed", "bg-danger") if late else ("On Time", "bg-success")
+
+    # Unmigrated rows (no scheduled_min) sort first, like MongoDB's missing < numbers
+    ordered = sorted(waybills, key=lambda wb: (wb.get('scheduled_min') is not None,
+                                               wb.get('scheduled_min') or 0, wb.get('scheduledTime') or ''))
+    rows = []
+    for wb in ordered:
+        label, css = status(wb)
+        rows.append({
+            "busRegNo": wb.get('busRegNo', ''),
+            "serviceCategory": wb.get('serviceCategory', ''),
+            "route": f"{wb.get('origin', '')} - {wb.get('destination', '')}",
+            "scheduledTime": hhmm(wb, 'scheduled_min', 'scheduledTime', ''),
+            "actualTime": hhmm(wb, 'actual_min', 'actualTime', '-'),
+            "movementType": wb.get('movementType', ''),
+            "status": label,
+            "statusClass": css,
+            "alerts": "PF-" + str(wb.get('platformNumber', '-'))
+        })
+    return rows
+
+def old_day_stats(waybills):
+    """The loop _load_depot_day_stats ran before depot_day_stats_pipeline."""
+    stats = DepotDayStats()
+    for wb in waybills:
+        stats.add(wb)
+    return stats
+
+def _new(minute, **form):
+    form.setdefault("busRegNo", f"KL-15-A-{1000 + minute}")
+    record = normalize_waybill(form)
+    record.update(depot_id="TVM", timestamp=DAY + timedelta(hours=8, minutes=minute))
+    return record
+
+def _legacy(minute, **fields):
+    fields.setdefault("busRegNo", f"KL-01-B-{1000 + minute}")
+    return dict(fields, depot_id="TVM", timestamp=DAY + timedelta(hours=8, minutes=minute))
+
+WAYBILLS = [
+    # Written through normalize_waybill (minute fields)
+    _new(1, scheduledTime="10:00", actualTime="10:00", movementType="Arrival", platformNumber="1",
+         origin="TVM", destination="EKM", serviceCategory="Fast"),
+    _new(2, scheduledTime="10:10", actualTime="10:25", movementType="Departure", platformNumber="2"),
+    _new(3, scheduledTime="10:20", actualTime="10:05"),
+    _new(4, scheduledTime="10:30"), # Not departed yet
+    _new(5, scheduledTime="23:55", actualTime="00:10"), # 15 minutes late across midnight
+    _new(6, scheduledTime="00:05", actualTime="23:58"), # 7 minutes early across midnight
+    _new(7, actualTime="11:00"), # No schedule
+    # Legacy documents (HH:MM strings, not migrated)
+    _legacy(8, scheduledTime="09:00", actualTime="09:20", platformNumber="3", origin="KLM"),
+    _legacy(9, scheduledTime="09:10", actualTime="09:05"),
+    _legacy(10, scheduledTime="09:20", actualTime=""), # Empty string time
+    _legacy(11, scheduledTime="09:30"), # Missing actualTime
+    _legacy(12, scheduledTime="", actualTime="09:40"),
+    _legacy(13, scheduledTime="23:50", actualTime="00:05"), # Text comparison: not late
+    _legacy(14, scheduledTime="09:50", actualTime="09:50", platformNumber=4),
+]
+
+@pytest.fixture
+def waybills(db):
+    db.waybills.insert_many([dict(wb) for wb in WAYBILLS])
+    # Another depot and another day must not leak in
+    db.waybills.insert_one(dict(WAYBILLS[1], depot_id="EKM"))
+    db.waybills.insert_one(dict(WAYBILLS[1], timestamp=DAY - timedelta(hours=1)))
+    return db.waybills
+
+def test_master_log_matches_python(waybills):
+    rows = list(waybills.aggregate(master_log_pipeline("TVM", DAY, DAY + timedelta(days=1))))
+    assert rows == old_master_log(WAYBILLS)
+    assert {r['status'] for r in rows} == {"On Time", "Delayed", "Scheduled"}
+
+def test_master_log_midnight_wrap(waybills):
+    rows = {r['busRegNo']: r for r in waybills.aggregate(master_log_pipeline("TVM", DAY, DAY + timedelta(days=1)))}
+    assert (rows["KL-15-A-1005"]['status'], rows["KL-15-A-1005"]['actualTime']) == ("Delayed", "00:10")
+    assert rows["KL-15-A-1006"]['status'] == "On Time"
+
+def test_day_stats_match_python(waybills):
+    [row] = waybills.aggregate(depot_day_stats_pipeline("TVM", DAY, DAY + timedelta(days=1)))
+    expected = old_day_stats(WAYBILLS)
+    assert row['total'] == expected.total == len(WAYBILLS)
+    assert row['on_time'] == expected.on_time
+    assert set(row['buses']) == expected.buses
+    assert {str(p) for p in row['platforms'] if p not in (None, '')} == expected.platforms
+
+def test_day_stats_loader_matches_python(waybills):
+    import app as appmod
+    loaded = appmod._load_depot_day_stats("TVM", DAY.date())
+    assert loaded.as_dict(4) == old_day_stats(WAYBILLS).as_dict(4)
+    assert appmod._load_depot_day_stats("TVM", (DAY + timedelta(days=5)).date()).as_dict(4) == DepotDayStats().as_dict(4)
+
+def test_home_rows_use_the_master_log_status(station_master, db):
+    # 23:55 -> 00:10 is 15 minutes late although "00:10" < "23:55" as text
+    empty = station_master.get('/').get_data(as_text=True)
+    db.waybills.insert_many([dict(WAYBILLS[i], timestamp=datetime.now()) for i in (0, 4, 7)])
+    html = station_master.get('/').get_data(as_text=True)
+    rows = {text: html.count(text) - empty.count(text) for text in ("Delayed", "On Time")}
+    assert rows == {"Delayed": 2, "On Time": 1}
@@ -0,0 +1,58 @@
+import gzip
+import json
+import pytest
+import app as appmod
+
+@pytest.fixture
+def bundle_client(station_master, db):
+    appmod._reference_bundles.clear()
+    db.places.insert_one({"name": "Ernakulam", "code": "EKM"})
+    db.buses.insert_one({"bus_reg_no": "KL-15-A-1102", "service_category": "Fast"})
+    db.crew.insert_many([{"crew_id": "C1", "name": "Raj", "depot_ids": ["TVM"]},
+                         {"crew_id": "C2", "name": "Other depot", "depot_ids": ["EKM"]}])
+    return station_master
+
+def _get(client, **headers):
+    return client.get('/api/reference-bundle', headers=headers)
+
+def test_bundle_contents(bundle_client):
+    body = _get(bundle_client).get_json()
+    assert body == {"places": [["Ernakulam", "EKM"]], "buses": [["KL-15-A-1102", "Fast"]],
+                    "crew": {"C1": ["Raj", None, None]}, "platforms": [1, 2]}
+
+def test_etag_revalidates_to_304_until_the_data_changes(bundle_client, db):
+    first = _get(bundle_client)
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == "private, no-cache"
+    again = _get(bundle_client, **{"If-None-Match": etag})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert again.headers['ETag'] == etag
+
+    with bundle_client.session_transaction() as s:
+        s['is_admin'] = True
+    bundle_client.post('/api/admin/data/buses', json={"bus_reg_no": "KL-07-B-3000"})
+    changed = _get(bundle_client, **{"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert ["KL-07-B-3000", None] in changed.get_json()['buses']
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+])
+def test_accept_encoding_negotiation(bundle_client, accept, expected, monkeypatch):
+    monkeypatch.setattr(appmod, "brotli", None)
+    plain = _get(bundle_client).get_data()
+    r = _get(bundle_client, **({"Accept-Encoding": accept} if accept else {}))
+    assert r.headers.get('Content-Encoding') == expected
+    assert "Accept-Encoding" in r.headers['Vary']
+    body = gzip.decompress(r.get_data()) if expected == "gzip" else r.get_data()
+    assert json.loads(body) == json.loads(plain)
+
+def test_brotli_preferred_when_installed(bundle_client):
+    brotli = pytest.importorskip("brotli")
+    r = _get(bundle_client, **{"Accept-Encoding": "gzip, br"})
+    assert r.headers['Content-Encoding'] == "br"
+    assert json.loads(brotli.decompress(r.get_data())) == _get(bundle_client).get_json()
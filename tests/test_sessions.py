@@ -0,0 +1,100 @@
+import time
+from http.cookies import SimpleCookie
+import pytest
+
+# Several gunicorn workers behind one browser: two independent copies of
+# app.py (separate module state and session caches) sharing one
+# FileSessionStore directory, driven with a single cookie jar.
+
+class Browser:
+    """One cookie jar shared by requests to any worker."""
+
+    def __init__(self):
+        self.cookies = {}
+
+    def request(self, worker, method, path, **kwargs):
+        client = worker.app.test_client(use_cookies=False)
+        headers = kwargs.pop('headers', {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self.cookies.items())
+        response = client.open(path, method=method, headers=headers, **kwargs)
+        for header in response.headers.getlist('Set-Cookie'):
+            for key, morsel in SimpleCookie(header).items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[key] = morsel.value
+                else:
+                    self.cookies.pop(key, None)
+        return response
+
+@pytest.fixture
+def workers(db, load_worker, tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "file")
+    monkeypatch.setenv("SESSION_FILE_DIR", str(tmp_path / "sessions"))
+    db.users.insert_one({"stationMasterId": "SM_TVM_001", "stationMasterId_lower": "sm_tvm_001",
+                         "depotId": "TVM", "password": "secret", "name": "Thiruvananthapuram", "platform_count": 2})
+    return load_worker("app_worker_a"), load_worker("app_worker_b")
+
+def _login(browser, worker):
+    return browser.request(worker, 'POST', '/login', json={"depotId": "TVM", "stationMasterId": "sm_tvm_001", "password": "secret"})
+
+def test_login_on_one_worker_is_seen_by_the_other(workers):
+    a, b = workers
+    browser = Browser()
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 401
+    assert _login(browser, a).status_code == 200
+    r = browser.request(b, 'GET', '/api/live-data')
+    assert r.status_code == 200, r.get_json()
+    assert r.get_json()['status'] == 'success'
+
+def test_logout_on_one_worker_ends_the_session_on_the_other(workers):
+    a, b = workers
+    browser = Browser()
+    _login(browser, a)
+    stolen = dict(browser.cookies)
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 200 # b has now loaded the session
+    browser.request(a, 'GET', '/logout')
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 401
+    # The old cookie is dead too, not just dropped from this browser
+    browser.cookies = stolen
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 401
+
+def test_login_moves_to_a_fresh_session_id(workers):
+    a, b = workers
+    browser = Browser()
+    browser.request(a, 'GET', '/login')
+    _login(browser, a)
+    first = dict(browser.cookies)
+    _login(browser, b)
+    assert browser.cookies != first
+    browser.cookies = first
+    assert browser.request(a, 'GET', '/api/live-data').status_code == 401
+
+def _session_file(tmp_path):
+    [path] = (tmp_path / "sessions").iterdir()
+    expires_at, raw = path.read_text(encoding='utf-8').split('\n', 1)
+    return path, float(expires_at), raw
+
+def test_active_session_is_extended_past_half_its_lifetime(workers, tmp_path):
+    a, b = workers
+    browser = Browser()
+    _login(browser, a)
+    path, expires_at, raw = _session_file(tmp_path)
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 200
+    assert _session_file(tmp_path)[1] == expires_at # Early in the lifetime: no write
+
+    path.write_text(f"{time.time() + 3600}\n{raw}", encoding='utf-8') # One hour of twelve left
+    assert browser.request(b, 'GET', '/api/live-data').status_code == 200
+    assert _session_file(tmp_path)[1] > time.time() + 11 * 3600
+
+def test_static_files_and_probes_skip_the_session_store(workers, monkeypatch):
+    a, _ = workers
+    browser = Browser()
+    _login(browser, a)
+    store = a.app.session_interface.store
+    loads = []
+    monkeypatch.setattr(store, "load", lambda sid, load=store.load: loads.append(sid) or load(sid))
+    for path in ('/static/script.js', '/metrics', '/readyz'):
+        browser.request(a, 'GET', path)
+    assert loads == []
+    assert browser.request(a, 'GET', '/api/live-data').status_code == 200
+    assert len(loads) == 1
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+FORM = {
+    "busRegNo": "KL-15-A-1102", "serviceCategory": "Fast", "origin": "TVM", "destination": "EKM",
+    "scheduledTime": "10:00", "actualTime": "10:05", "movementType": "Departure", "platformNumber": "2",
+    "conductorId": "C1", "conductorName": "Raj", "conductorPhone": "999",
+    "driverId": "D1", "driverName": "Mo", "driverPhone": "888",
+}
+
+def test_save_waybill_stores_compact_record(station_master, db):
+    r = station_master.post('/api/waybill', json=FORM)
+    assert r.status_code == 201, r.get_json()
+    stored = db.waybills.find_one({}, {"_id": 0, "timestamp": 0})
+    assert stored['scheduled_min'] == 600 and stored['delay_minutes'] == 5
+    assert "conductorName" not in stored and stored['conductorId'] == "C1"
+    assert db.crew.find_one({"crew_id": "C1"})['name'] == "Raj"
+
+def test_save_waybill_rejects_unknown_fields(station_master, db):
+    r = station_master.post('/api/waybill', json=dict(FORM, extra="x"))
+    assert r.status_code == 400
+    assert db.waybills.count_documents({}) == 0
+
+def test_unchanged_registry_rows_are_not_rewritten(station_master, db):
+    station_master.post('/api/waybill', json=FORM)
+    before = db.crew.find_one({"crew_id": "C1"})
+    station_master.post('/api/waybill', json=FORM)
+    assert db.crew.find_one({"crew_id": "C1"}) == before
+
+def test_registry_rows_changed_elsewhere_are_rewritten(station_master, db):
+    # Another worker (or an admin edit) changed or removed rows this process wrote
+    station_master.post('/api/waybill', json=FORM)
+    db.crew.update_one({"crew_id": "C1"}, {"$set": {"name": "Edited", "last_updated": datetime(2020, 1, 1)}})
+    db.buses.delete_many({})
+    station_master.post('/api/waybill', json=FORM)
+    crew = db.crew.find_one({"crew_id": "C1"})
+    assert crew['name'] == "Raj" and crew['last_updated'] > datetime(2020, 1, 1)
+    assert db.buses.find_one({"bus_reg_no": "KL-15-A-1102"})['service_category'] == "Fast"
+
+def test_missing_crew_details_keep_the_stored_ones(station_master, db):
+    station_master.post('/api/waybill', json=FORM)
+    form = {k: v for k, v in FORM.items() if k not in ("conductorName", "conductorPhone")}
+    station_master.post('/api/waybill', json=form)
+    crew = db.crew.find_one({"crew_id": "C1"})
+    assert (crew['name'], crew['phone'], crew['depot_ids']) == ("Raj", "999", ["TVM"])
+
+def test_batch_rejects_bad_entries_and_dedupes(station_master, db):
+    entries = [dict(FORM, idempotencyKey="k1"), dict(FORM, idempotencyKey="k1"), dict(FORM, platformNumber="x")]
+    result = station_master.post('/api/waybill/batch', json={"waybills": entries}).get_json()
+    assert result['inserted'] == 1
+    assert result['duplicates'] == ["k1"]
+    assert [e['index'] for e in result['rejected']] == [2]
+
+def test_waybill_routes_require_a_session_user(client, db):
+    for url, body in (('/api/waybill', FORM), ('/api/waybill/batch', {"waybills": [FORM]})):
+        assert client.post(url, json=body).status_code == 401
+    assert db.waybills.count_documents({}) == 0
+
+def test_non_json_body_is_a_bad_request(station_master, db):
+    for url in ('/api/waybill', '/api/waybill/batch'):
+        r = station_master.post(url, data="busRegNo=KL-1", content_type="text/plain")
+        assert r.status_code == 400 and r.get_json()['status'] == "error"
+
+def test_batch_replay_returns_the_original_ids(station_master, db):
+    entries = [dict(FORM, idempotencyKey="k1"), dict(FORM, idempotencyKey="k2", busRegNo="KL-07-B-1")]
+    first = station_master.post('/api/waybill/batch', json={"waybills": entries})
+    assert first.status_code == 201
+    ids = first.get_json()['ids']
+    assert ids == {doc['idempotency_key']: str(doc['_id']) for doc in db.waybills.find()}
+
+    # The client never saw the response and flushes again, with a new entry added
+    replay = station_master.post('/api/waybill/batch', json={"waybills": entries + [dict(FORM, idempotencyKey="k3")]})
+    body = replay.get_json()
+    assert (replay.status_code, body['inserted'], body['duplicates']) == (201, 1, ["k1", "k2"])
+    assert {k: body['ids'][k] for k in ("k1", "k2")} == ids
+    assert db.waybills.count_documents({}) == 3
+    assert station_master.post('/api/waybill/batch', json={"waybills": entries}).get_json()['ids'] == ids
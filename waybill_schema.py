@@ -0,0 +1,176 @@
+from normalize import bus_key_fields
+
+# Stored shape of a waybill, and the checks applied when one is written.
+#
+# The form still posts "HH:MM" strings and crew names/phones. Times are
+# stored as minutes since midnight (scheduled_min, actual_min) with the
+# difference precomputed in delay_minutes, so delay ranges are plain
+# indexed comparisons. Crew are referenced by conductorId/driverId only:
+# names and phones go to the crew collection (see _build_registry_ops in
+# app.py) instead of being copied into every waybill. The bus is referenced
+# by busRegNo plus its search keys.
+
+# Everything a client may send for one waybill; anything else is rejected
+INPUT_FIELDS = {
+    "busRegNo", "serviceCategory", "movementType", "origin", "destination", "viaRoute",
+    "platformNumber", "scheduledTime", "actualTime",
+    "conductorId", "conductorName", "conductorPhone",
+    "driverId", "driverName", "driverPhone",
+    "idempotencyKey",
+}
+
+# Copied to the stored document unchanged (after trimming)
+TEXT_FIELDS = ("busRegNo", "serviceCategory", "movementType", "origin", "destination", "viaRoute",
+               "conductorId", "driverId")
+
+MOVEMENT_TYPES = ("Arrival", "Departure")
+
+# Legacy fields the migration converts or removes
+LEGACY_FIELDS = ("scheduledTime", "actualTime", "conductorName", "conductorPhone", "driverName", "driverPhone")
+
+MINUTES_PER_DAY = 24 * 60
+
+def parse_hhmm(value):
+    """"HH:MM" (or "HH:MM:SS") -> minutes since midnight. Raises ValueError."""
+    parts = str(value).strip().split(':')
+    if len(parts) not in (2, 3) or not all(p.isdigit() for p in parts):
+        raise ValueError(f"{value!r} is not a HH:MM time")
+    hours, minutes = int(parts[0]), int(parts[1])
+    if hours > 23 or minutes > 59:
+        raise ValueError(f"{value!r} is not a HH:MM time")
+    return hours * 60 + minutes
+
+def format_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def delay_minutes(scheduled_min, actual_min):
+    """
+    actual - scheduled, taken the short way round midnight (23:55 -> 00:10
+    is 15 minutes late, not 1425 early). None unless both are set.
+    """
+    if scheduled_min is None or actual_min is None:
+        return None
+    delay = actual_min - scheduled_min
+    if delay > MINUTES_PER_DAY // 2:
+        delay -= MINUTES_PER_DAY
+    elif delay < -(MINUTES_PER_DAY // 2):
+        delay += MINUTES_PER_DAY
+    return delay
+
+def normalize_waybill(data):
+    """
+    Validates a submitted waybill and returns the fields to store.
+    Raises ValueError with a readable message.
+    """
+    if not isinstance(data, dict) or not data:
+        raise ValueError("Waybill must be a non-empty object")
+    unknown = sorted(str(k) for k in data if k not in INPUT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    for key, value in data.items():
+        if isinstance(value, bool) or not isinstance(value, (str, int, type(None))):
+            raise ValueError(f"{key} must be a string")
+
+    def text(key):
+        value = data.get(key)
+        return str(value).strip() if value is not None else ''
+
+    record = {}
+    for key in TEXT_FIELDS:
+        if text(key):
+            record[key] = text(key)
+
+    if not record.get('busRegNo'):
+        raise ValueError("busRegNo is required")
+    if record.get('movementType') not in (None,) + MOVEMENT_TYPES:
+        raise ValueError("movementType must be Arrival or Departure")
+    for prefix in ("conductor", "driver"):
+        if (text(f'{prefix}Name') or text(f'{prefix}Phone')) and not record.get(f'{prefix}Id'):
+            raise ValueError(f"{prefix}Id is required with {prefix}Name/{prefix}Phone")
+
+    if text('platformNumber'):
+        try:
+            record['platformNumber'] = int(text('platformNumber'))
+        except ValueError:
+            raise ValueError("platformNumber must be a number")
+
+    for key, target in (("scheduledTime", "scheduled_min"), ("actualTime", "actual_min")):
+        if text(key):
+            try:
+                record[target] = parse_hhmm(text(key))
+            except ValueError as e:
+                raise ValueError(f"{key}: {e}")
+    delay = delay_minutes(record.get('scheduled_min'), record.get('actual_min'))
+    if delay is not None:
+        record['delay_minutes'] = delay
+
+    # Normalized keys for indexed bus number search
+    record.update(bus_key_fields(record['busRegNo']))
+
+    # Client-generated key used to drop replays of the same offline entry
+    if text('idempotencyKey'):
+        record['idempotency_key'] = text('idempotencyKey')
+    return record
+
+def stored_delay(doc):
+    """delay_minutes of a stored waybill, computed from the legacy strings if not migrated yet."""
+    if doc.get('delay_minutes') is not None:
+        return doc['delay_minutes']
+    try:
+        return delay_minutes(parse_hhmm(doc['scheduledTime']), parse_hhmm(doc['actualTime']))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def is_on_time(doc):
+    """
+    Not later than scheduled: delay_minutes <= 0, or on documents not
+    migrated yet actualTime <= scheduledTime compared as "HH:MM" text.
+    Same rule as pipelines._on_time.
+    """
+    delay = doc.get('delay_minutes')
+    if isinstance(delay, (int, float)) and not isinstance(delay, bool):
+        return delay <= 0
+    return bool(doc.get('actualTime') and doc.get('scheduledTime') and doc['actualTime'] <= doc['scheduledTime'])
+
+def upgrade_legacy(doc):
+    """
+    ($set, $unset, crew rows) turning a legacy waybill into the stored shape.
+    Times that do not parse are left as they are; crew rows carry the
+    names/phones the waybill held so they can seed the crew collection.
+    """
+    updates = {}
+    unset = {}
+    for key, target in (("scheduledTime", "scheduled_min"), ("actualTime", "actual_min")):
+        if key not in doc:
+            continue
+        if doc[key] in (None, ''):
+            unset[key] = ""
+            continue
+        try:
+            updates[target] = parse_hhmm(doc[key])
+            unset[key] = ""
+        except ValueError:
+            pass
+    delay = delay_minutes(updates.get('scheduled_min', doc.get('scheduled_min')),
+                          updates.get('actual_min', doc.get('actual_min')))
+    if delay is not None and doc.get('delay_minutes') != delay:
+        updates['delay_minutes'] = delay
+
+    if isinstance(doc.get('platformNumber'), str):
+        try:
+            updates['platformNumber'] = int(doc['platformNumber'])
+        except ValueError:
+            pass
+
+    crew = []
+    for role, prefix in (("Conductor", "conductor"), ("Driver", "driver")):
+        name = doc.get(f'{prefix}Name')
+        phone = doc.get(f'{prefix}Phone')
+        if not doc.get(f'{prefix}Id'):
+            continue # Nothing to reference: the text stays on the waybill
+        if name or phone:
+            crew.append({"crew_id": doc[f'{prefix}Id'], "name": name, "phone": phone, "role": role})
+        for key in (f'{prefix}Name', f'{prefix}Phone'):
+            if key in doc:
+                unset[key] = ""
+    return updates, unset, crew